@@ -1,37 +1,135 @@
 import yfinance as yf
-import matplotlib.pyplot as plt
 import pandas as pd
+import numpy as np
 import requests
-from flask import Flask, render_template, request, Response
-from threading import Thread, Event
-import mysql.connector
+from flask import Flask, render_template, request, Response, make_response, send_file, abort, g
+from werkzeug.http import is_resource_modified
+from threading import Thread, Lock
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import multiprocessing
+import re
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
-import base64
-from io import BytesIO
-import matplotlib
+from datetime import datetime, timedelta, timezone
+from io import BytesIO, StringIO
 from apscheduler.schedulers.background import BackgroundScheduler
 import pytz
 import time
 import logging
+import json
+import hashlib
+import cProfile
+import marshal
+import pstats
+import charts
+import db
+import downsampling
+import http_cache
+import metrics
+from events import EventHub
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+except ImportError:
+  # Arrow and Parquet output of /api/series are optional
+  pa = None
 
-matplotlib.use('Agg')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 load_dotenv()
 
 app = Flask(__name__)
 
-# Database Configuration
-DB_HOST = os.environ.get("MYSQL_HOST")
-DB_USER = os.environ.get("MYSQL_USER")
-DB_PASSWORD = os.environ.get("MYSQL_PASSWORD")
-DB_NAME = os.environ.get("MYSQL_DB")
-
 # FRED API Key
 FRED_API_KEY = os.environ.get("FRED_API_KEY")
+# Base URL of the FRED API, pointed at benchmarks/fred_stub.py for offline runs
+FRED_API_URL = os.environ.get("FRED_API_URL", "https://api.stlouisfed.org/fred").rstrip("/")
+
+# History pulled for new or reset indicators
+BACKFILL_DAYS = 20 * 365
+# Days before the latest stored observation that are re-requested on
+# incremental refreshes, so recent revisions are picked up
+REVISION_WINDOW_DAYS = int(os.environ.get("REVISION_WINDOW_DAYS", 90))
+
+# Number of series fetched in parallel during a refresh
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", 4))
+# Minimum seconds between two requests to the same host (FRED allows 120 requests per minute)
+FETCH_MIN_INTERVAL = float(os.environ.get("FETCH_MIN_INTERVAL", 0.5))
+# Seconds before an upstream request is abandoned, and how often it is retried
+# with jittered exponential backoff (FETCH_BACKOFF, 2x, 4x, ... up to FETCH_BACKOFF_MAX)
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", 10))
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", 3))
+FETCH_BACKOFF = float(os.environ.get("FETCH_BACKOFF", 1.0))
+FETCH_BACKOFF_MAX = float(os.environ.get("FETCH_BACKOFF_MAX", 30))
+# Failed fetches in a row after which a host is left alone for FETCH_BREAKER_RESET seconds
+FETCH_BREAKER_THRESHOLD = int(os.environ.get("FETCH_BREAKER_THRESHOLD", 5))
+FETCH_BREAKER_RESET = float(os.environ.get("FETCH_BREAKER_RESET", 300))
+
+# On-disk cache of upstream responses. Series metadata such as units rarely
+# changes, observations are only reused across refreshes close together.
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_METADATA_TTL = float(os.environ.get("HTTP_CACHE_METADATA_TTL", 7 * 24 * 3600))
+HTTP_CACHE_OBSERVATIONS_TTL = float(os.environ.get("HTTP_CACHE_OBSERVATIONS_TTL", 3600))
+
+# Seconds between heartbeats on idle /subscribe streams
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", 15))
+# Largest number of changed points sent inline with an update event; bigger
+# refreshes only announce which indicators changed
+SSE_MAX_DELTA_POINTS = int(os.environ.get("SSE_MAX_DELTA_POINTS", 2000))
+
+# Load data in a background thread at startup, so the server answers right
+# away with whatever is already stored; /readyz reports when the load is done
+BACKGROUND_INITIAL_LOAD = os.environ.get("BACKGROUND_INITIAL_LOAD", "true").lower() in ("1", "true", "yes")
+# Share of indicators that need data to serve before /readyz reports ready
+# after the initial load, so one discontinued series does not block it but an
+# unreachable FRED with an empty database does
+READY_MIN_FRACTION = float(os.environ.get("READY_MIN_FRACTION", 0.9))
+
+# Lets any request be profiled with ?profile=1 (pstats text) or ?profile=prof
+# (binary cProfile dump for snakeviz, flameprof or gprof2dot)
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Render every time range into the chart cache right after a refresh writes new data
+PREWARM_RENDER_CACHE = os.environ.get("PREWARM_RENDER_CACHE", "true").lower() in ("1", "true", "yes")
+
+# Worker processes rendering chart tiles, 0 renders in the request thread
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+
+# Points kept per series for each pixel of tile width; series with fewer points
+# in the selected range, such as monthly and quarterly ones, are left as is
+DOWNSAMPLE_POINTS_PER_PX = float(os.environ.get("DOWNSAMPLE_POINTS_PER_PX", 0.5))
+# "lttb" (largest-triangle-three-buckets) or "minmax" (min/max per bucket)
+DOWNSAMPLE_METHOD = os.environ.get("DOWNSAMPLE_METHOD", "lttb")
+DOWNSAMPLE_POINTS = int(charts.TILE_SIZE[0] * charts.TILE_DPI * DOWNSAMPLE_POINTS_PER_PX)
+
+TIME_RANGES = ['3m', '1y', '3y', '5y', '10y', '20y']
+DEFAULT_TIME_RANGE = '5y'
+
+# Pre-aggregated tables kept next to historical_data, coarsest first:
+# (table, pandas period alias, days per period)
+ROLLUPS = [
+    ("historical_data_monthly", "M", 30),
+    ("historical_data_weekly", "W", 7),
+]
+# Typical days between observations for each native frequency code
+FREQUENCY_DAYS = {"D": 1, "W": 7, "M": 30, "Q": 91, "A": 365}
+
+# Hours between upstream checks for the series of each native frequency,
+# overridden per code with e.g. POLL_INTERVAL_HOURS="Q=72,A=168". A check asks
+# FRED which series were updated since the previous one and refreshes those.
+POLL_INTERVAL_HOURS = {"D": 1, "W": 6, "M": 12, "Q": 24, "A": 24}
+POLL_INTERVAL_HOURS.update({code.strip(): float(hours) for code, hours in (
+    item.split("=") for item in os.environ.get("POLL_INTERVAL_HOURS", "").split(",") if item.strip())})
+# FRED lists updated series for the last two weeks only, in pages of up to 1000
+FRED_UPDATES_WINDOW = timedelta(days=13)
+FRED_UPDATES_PAGE_SIZE = 1000
+
+# Rows sent per multi-row INSERT statement when persisting observations
+UPSERT_CHUNK_SIZE = int(os.environ.get("UPSERT_CHUNK_SIZE", 1000))
+# Relative tolerance when comparing fetched values with the stored (single precision) values
+VALUE_TOLERANCE = float(os.environ.get("VALUE_TOLERANCE", 1e-6))
 
 # Indicators to Fetch
 INDICATORS = {
@@ -56,35 +154,193 @@ INDICATORS = {
     "Money Market Funds": "MMMFFAQ027S"
 }
 
-update_event = Event()
+# Indicators computed from stored ones over their full history and stored
+# alongside them. "lookback_days" is how much source history before the first
+# changed point is needed to recompute it.
+DERIVED_INDICATORS = {
+    "Inflation Rate": {
+        "sources": ["PCE (Inflation)"],
+        "units": "Percent",
+        "lookback_days": 400,
+        "compute": lambda s: s["PCE (Inflation)"].pct_change(periods=12) * 100,
+    },
+    "GDP Change": {
+        "sources": ["GDP"],
+        "units": "Percent",
+        "lookback_days": 120,
+        "compute": lambda s: s["GDP"].pct_change(periods=1) * 400,
+    },
+    "10Y-2Y Treasury Spread": {
+        "sources": ["10-Year Treasury Yield", "2-Year Treasury Yield"],
+        "units": "Percent",
+        "lookback_days": 0,
+        "compute": lambda s: s["10-Year Treasury Yield"] - s["2-Year Treasury Yield"],
+    },
+    "S&P 500 200-Day Moving Average": {
+        "sources": ["S&P 500 Index"],
+        "units": "Points",
+        "lookback_days": 300,
+        "compute": lambda s: s["S&P 500 Index"].rolling(200).mean(),
+    },
+}
+
+# Dashboard tiles, in display order
+PLOT_ORDER = [
+    "GDP",
+    "GDP Change",
+    "PCE (Inflation)",
+    "Inflation Rate",
+    "S&P 500 Index",
+    "Treasury Yields",
+    "10Y-2Y Treasury Spread",
+    "Unemployment Rate",
+    "Initial Jobless Claims",
+    "Corporate Profits",
+    "Industrial Production",
+    "Consumer Sentiment",
+    "Retail Sales",
+    "Federal Funds Rate",
+    "M2 Money Supply",
+    "ISM Manufacturing PMI",
+    "Producer Price Index",
+    "Housing Starts",
+    "Trade Balance",
+    "Money Market Funds",
+]
+
+# Tiles combining several stored indicators, one line each; every other tile
+# is drawn from the indicator of the same name
+TILE_SOURCES = {
+    "S&P 500 Index": ["S&P 500 Index", "S&P 500 200-Day Moving Average"],
+    "Treasury Yields": ["2-Year Treasury Yield", "10-Year Treasury Yield", "20-Year Treasury Yield"],
+}
+
+TILE_SLUGS = {re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-'): name for name in PLOT_ORDER}
+
+
+# Point counts of the most recent refresh_data() run, per indicator and in total
+last_refresh_stats = {}
+
+# (start_date, data_frames, indicator_units) per time_range, shared by all
+# requests for the same range start until the next refresh that commits new
+# data bumps data_version and clears it
+data_cache = {}
+data_cache_lock = Lock()
+data_version = 0
+data_last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+# Per-indicator versions, bumped only for indicators that received new data
+indicator_versions = {}
+# Distinguishes version counters of this process from those of earlier runs
+DATA_EPOCH = int(data_last_modified.timestamp())
+
+# Update events pushed to /subscribe clients
+event_hub = EventHub(DATA_EPOCH)
+
+# (tile name, time_range) -> (range start date, source versions, PNG bytes)
+tile_cache = {}
+# (tile name, time_range, range start date, source versions) -> Future of a render in progress
+tile_futures = {}
+tile_lock = Lock()
+render_pool = None
+
+# Serializes scheduled refreshes of different frequencies
+refresh_lock = Lock()
+# Per series, the time up to which FRED updates have been handled, so a poll
+# only lists the updates since then
+last_checked = {}
+
+# Prometheus metrics served at /metrics
+FETCH_SECONDS = metrics.histogram(
+    "fetch_seconds", "Time to fetch one series, including cache hits, retries and rate limiting", ["indicator"])
+UPSTREAM_REQUEST_SECONDS = metrics.histogram(
+    "upstream_request_seconds", "Latency of HTTP requests to upstream APIs", ["host", "endpoint", "status"])
+UPSTREAM_RESPONSE_BYTES = metrics.counter(
+    "upstream_response_bytes_total", "Response bytes received from upstream APIs", ["series"])
+UPSTREAM_CACHE = metrics.counter(
+    "upstream_cache_total", "Upstream fetches by cache outcome", ["result"])
+DB_WRITE_SECONDS = metrics.histogram(
+    "db_write_seconds", "Time to diff, upsert, roll up and commit one indicator", ["indicator"])
+DB_ROWS_WRITTEN = metrics.counter(
+    "db_rows_written_total", "New or revised observations written", ["indicator"])
+DB_STATEMENTS = metrics.counter(
+    "db_statements_total", "SQL statements executed", ["kind"])
+DB_STATEMENT_SECONDS = metrics.counter(
+    "db_statement_seconds_total", "Time spent executing SQL statements", ["kind"])
+DB_POOL = metrics.gauge(
+    "db_pool", "Connection pool state and counters", ["stat"])
+REFRESH_SECONDS = metrics.histogram(
+    "refresh_seconds", "Duration of refresh_data runs")
+REFRESH_POINTS = metrics.counter(
+    "refresh_points_total", "Fetched points by comparison with the stored values", ["result"])
+DATA_QUERY_SECONDS = metrics.histogram(
+    "data_query_seconds", "Time to load all series for a time range on a cache miss", ["time_range", "phase"])
+DATA_CACHE_REQUESTS = metrics.counter(
+    "data_cache_requests_total", "Lookups in the per time range data cache", ["result"])
+TILE_RENDER_SECONDS = metrics.histogram(
+    "tile_render_seconds", "Time spent in each phase of rendering a chart tile", ["phase"])
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_seconds", "Time to handle a request, up to the first byte for streams", ["endpoint", "method", "status"])
+
+# Progress of the initial load ("starting", "loading", "ready", "degraded" when
+# too few indicators have data after it, or "failed"),
+# and per indicator the state of its latest refresh ("stored", "pending",
+# "fetching", "fetched", "loaded" or "failed") and whether it has data to serve
+startup_state = {"phase": "starting", "started_at": None, "finished_at": None, "error": None}
+load_state = {}
+load_state_lock = Lock()
 
 
-def get_db_connection():
-  conn = mysql.connector.connect(
-      host=DB_HOST,
-      user=DB_USER,
-      password=DB_PASSWORD,
-      database=DB_NAME
-  )
-  return conn
+class HostRateLimiter:
+  def __init__(self, min_interval):
+    self.min_interval = min_interval
+    self.lock = Lock()
+    self.next_slot = {}
+
+  def wait(self, host):
+    # Reserve the next free slot for the host, then sleep outside the lock
+    with self.lock:
+      now = time.monotonic()
+      slot = max(now, self.next_slot.get(host, now))
+      self.next_slot[host] = slot + self.min_interval
+    if slot > now:
+      time.sleep(slot - now)
+
+
+rate_limiter = HostRateLimiter(FETCH_MIN_INTERVAL)
+
+# Pooled HTTP session shared by all fetch workers
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=FETCH_CONCURRENCY, pool_maxsize=FETCH_CONCURRENCY))
+# Every FRED and Yahoo fetch goes through the response cache
+def observe_upstream_response(url, params, status, seconds, size):
+  parsed = urlparse(url)
+  UPSTREAM_REQUEST_SECONDS.observe(seconds, host=parsed.netloc, endpoint=parsed.path.rsplit("/", 1)[-1], status=status)
+  UPSTREAM_RESPONSE_BYTES.inc(size, series=params.get("series_id", ""))
+
+
+upstream = http_cache.CachedClient(
+    http_cache.ResponseCache(HTTP_CACHE_DIR), http_session, rate_limiter, FETCH_TIMEOUT, FETCH_RETRIES,
+    FETCH_BACKOFF, FETCH_BACKOFF_MAX, FETCH_BREAKER_THRESHOLD, FETCH_BREAKER_RESET, observe_upstream_response)
 
 
 def create_database_and_tables():
-  conn = get_db_connection()
+  conn = db.get_connection()
   cursor = conn.cursor()
-  cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
-  cursor.execute(f"USE {DB_NAME}")
-  cursor.execute("""
+  if db.STORAGE_BACKEND == "mysql":
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db.DB_NAME}")
+    cursor.execute(f"USE {db.DB_NAME}")
+  cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS indicators (
-            id INT AUTO_INCREMENT PRIMARY KEY,
+            id {db.ID_COLUMN},
             name VARCHAR(255) NOT NULL UNIQUE,
             units VARCHAR(50),
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            last_updated {db.TIMESTAMP_COLUMN}
         )
     """)
-  cursor.execute("""
+  cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS historical_data (
-            id INT AUTO_INCREMENT PRIMARY KEY,
+            id {db.ID_COLUMN},
             indicator_id INT NOT NULL,
             date DATE NOT NULL,
             value FLOAT NOT NULL,
@@ -92,11 +348,38 @@ def create_database_and_tables():
             FOREIGN KEY (indicator_id) REFERENCES indicators(id)
         )
     """)
+  for table, period, days in ROLLUPS:
+    cursor.execute(f"""
+          CREATE TABLE IF NOT EXISTS {table} (
+              indicator_id INT NOT NULL,
+              period_start DATE NOT NULL,
+              date DATE NOT NULL,
+              last_value FLOAT NOT NULL,
+              min_value FLOAT NOT NULL,
+              max_value FLOAT NOT NULL,
+              mean_value FLOAT NOT NULL,
+              count INT NOT NULL,
+              PRIMARY KEY (indicator_id, period_start),
+              FOREIGN KEY (indicator_id) REFERENCES indicators(id)
+          )
+      """)
+  ensure_column(cursor, "indicators", "frequency", "VARCHAR(1)")
+  ensure_column(cursor, "indicators", "source_updated", "VARCHAR(32)")
+  # Summary of the stored rows, read by show_db.py and show_history.py instead of scanning historical_data
+  ensure_column(cursor, "indicators", "row_count", "INT")
+  ensure_column(cursor, "indicators", "min_date", "DATE")
+  ensure_column(cursor, "indicators", "max_date", "DATE")
   conn.commit()
   cursor.close()
   conn.close()
 
 
+def ensure_column(cursor, table, column, definition):
+  # Adds columns introduced after a database was created
+  if not db.column_exists(cursor, table, column):
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
 def get_start_date(time_range):
   today = datetime.today()
   if time_range == '3m':
@@ -118,22 +401,68 @@ def get_start_date(time_range):
 def fetch_sp500_data(start_date):
   try:
     today = datetime.today().strftime('%Y-%m-%d')
-    sp500 = yf.Ticker("^GSPC")
-    df = sp500.history(start=start_date, end=today)
-    if df.empty:
+
+    def load():
+      history = yf.Ticker("^GSPC").history(start=start_date, end=today)
+      if history.empty:
+        return {"dates": [], "values": []}
+      return {"dates": history.index.strftime('%Y-%m-%d').tolist(), "values": history["Close"].tolist()}
+
+    closes = upstream.call("finance.yahoo.com", {"ticker": "^GSPC", "start": start_date, "end": today},
+                           HTTP_CACHE_OBSERVATIONS_TTL, load)
+    if not closes["dates"]:
       print(f"No S&P 500 data found for start_date: {start_date}")
       return None
-    df = df[["Close"]].rename(columns={"Close": "value"})
-    df.index = pd.to_datetime(df.index)
-    return df
+    return pd.DataFrame({"value": closes["values"]}, index=pd.to_datetime(closes["dates"]))
   except Exception as e:
     print(f"Error fetching S&P 500 data: {e}")
     return None
 
 
-def fetch_fred_data(series_id, start_date):
-  # Fetch observations
-  obs_url = f"https://api.stlouisfed.org/fred/series/observations"
+def fetch_fred_series_info(series_id, fresh=False):
+  # Series metadata: units, frequency_short, last_updated, ...
+  # fresh=True asks FRED itself instead of the response cache
+  series_url = f"{FRED_API_URL}/series"
+  series_params = {
+      "series_id": series_id,
+      "api_key": FRED_API_KEY,
+      "file_type": "json"
+  }
+  series_info = upstream.get_json(series_url, series_params, 0 if fresh else HTTP_CACHE_METADATA_TTL,
+                                  allow_stale=not fresh)
+  if "seriess" in series_info and len(series_info["seriess"]) > 0:
+    return series_info["seriess"][0]
+  return None
+
+
+def fetch_fred_series_updates(since, until, max_requests):
+  # {series_id: last_updated} of all FRED series updated between `since` and
+  # `until`, or None if paging through them takes more than `max_requests`
+  updates_url = f"{FRED_API_URL}/series/updates"
+  central = pytz.timezone("America/Chicago")
+  updates_params = {
+      "api_key": FRED_API_KEY,
+      "file_type": "json",
+      "filter_value": "all",
+      "start_time": since.astimezone(central).strftime('%Y%m%d%H%M'),
+      "end_time": until.astimezone(central).strftime('%Y%m%d%H%M'),
+      "limit": FRED_UPDATES_PAGE_SIZE,
+  }
+  updates = {}
+  for page in range(max_requests):
+    response = upstream.get_json(updates_url, dict(updates_params, offset=page * FRED_UPDATES_PAGE_SIZE), 0,
+                                 allow_stale=False)
+    for series in response.get("seriess", []):
+      updates[series["id"]] = series.get("last_updated")
+    if (page + 1) * FRED_UPDATES_PAGE_SIZE >= response.get("count", 0):
+      return updates
+  return None
+
+
+def fetch_fred_data(series_id, start_date, fresh=False):
+  # Fetch observations, from FRED itself when fresh=True: a cached response
+  # could predate the update that made the series due
+  obs_url = f"{FRED_API_URL}/series/observations"
   obs_params = {
       "series_id": series_id,
       "api_key": FRED_API_KEY,
@@ -141,27 +470,18 @@ def fetch_fred_data(series_id, start_date):
       "observation_start": start_date
   }
   try:
-    obs_response = requests.get(obs_url, params=obs_params)
-    obs_response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-    obs_data = obs_response.json()
+    obs_data = upstream.get_json(obs_url, obs_params, 0 if fresh else HTTP_CACHE_OBSERVATIONS_TTL,
+                                 allow_stale=not fresh)
   except requests.exceptions.RequestException as e:
     print(f"Error fetching FRED observations for {series_id}: {e}")
     return None, None
 
   # Fetch series info for units
-  series_url = f"https://api.stlouisfed.org/fred/series"
-  series_params = {
-      "series_id": series_id,
-      "api_key": FRED_API_KEY,
-      "file_type": "json"
-  }
   units = None
   try:
-    series_response = requests.get(series_url, params=series_params)
-    series_response.raise_for_status()
-    series_info = series_response.json()
-    if "seriess" in series_info and len(series_info["seriess"]) > 0:
-      units = series_info["seriess"][0].get("units")
+    series_info = fetch_fred_series_info(series_id)
+    if series_info:
+      units = series_info.get("units")
   except requests.exceptions.RequestException as e:
     print(f"Error fetching FRED series info for {series_id}: {e}")
     # Continue even if units cannot be fetched
@@ -177,83 +497,339 @@ def fetch_fred_data(series_id, start_date):
     return None, units
 
 
-def refresh_data(indicator_names=None):
-  global update_event
+def fetch_indicator(name, series_id, start_date, fresh=False):
+  if name == "S&P 500 Index":
+    df = fetch_sp500_data(start_date)
+    units = "Points"  # S&P 500 is in points
+    if df is None:
+      # If S&P 500 data from yfinance fails, try FRED as a fallback
+      df, units = fetch_fred_data(series_id, start_date, fresh)
+    return df, units
+  return fetch_fred_data(series_id, start_date, fresh)
+
+
+def timed_fetch_indicator(name, series_id, start_date, fresh=False):
+  started = time.perf_counter()
+  df, units = fetch_indicator(name, series_id, start_date, fresh)
+  elapsed = time.perf_counter() - started
+  FETCH_SECONDS.observe(elapsed, indicator=name)
+  return df, units, elapsed
+
+
+def set_load_state(names, state, **details):
+  now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+  with load_state_lock:
+    for name in names:
+      entry = load_state.setdefault(name, {"has_data": False})
+      entry.update(details, state=state, updated_at=now)
+      if state == "loaded":
+        entry["has_data"] = True
+
+
+def fetch_indicators(fetch_plan, fresh=False):
+  results = {}
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+    futures = {}
+    for name, (series_id, start_date) in fetch_plan.items():
+      futures[executor.submit(timed_fetch_indicator, name, series_id, start_date, fresh)] = name
+    for future in as_completed(futures):
+      name = futures[future]
+      try:
+        df, units, elapsed = future.result()
+        logging.info(f"Fetched {name} in {elapsed:.2f}s ({0 if df is None else len(df)} entries).")
+      except Exception as e:
+        logging.error(f"An unexpected error occurred fetching {name}: {e}")
+        df, units = None, None
+      results[name] = (df, units)
+      set_load_state([name], "fetched")
+  logging.info(f"Fetched {len(fetch_plan)} indicators in {time.perf_counter() - started:.2f}s "
+               f"with concurrency {FETCH_CONCURRENCY}.")
+  return results
+
+
+def get_latest_dates(cursor):
+  cursor.execute(
+      "SELECT i.name, MAX(h.date) AS latest FROM indicators i JOIN historical_data h ON h.indicator_id = i.id GROUP BY i.id, i.name")
+  # SQLite returns aggregates of DATE columns as ISO strings
+  return {row['name']: pd.Timestamp(row['latest']).date() for row in cursor.fetchall()}
+
+
+def get_fetch_start_date(latest_date, full_refresh=False):
+  if full_refresh or latest_date is None:
+    return (datetime.today() - timedelta(days=BACKFILL_DAYS)).strftime('%Y-%m-%d')
+  return (latest_date - timedelta(days=REVISION_WINDOW_DAYS)).strftime('%Y-%m-%d')
+
+
+def historical_rows(indicator_id, df):
+  return list(zip([indicator_id] * len(df), df.index.date, df["value"].astype(float).tolist()))
+
+
+def load_stored_values(cursor, indicator_id, start_date):
+  cursor.execute(
+      "SELECT date, value FROM historical_data WHERE indicator_id = %s AND date >= %s ORDER BY date",
+      (indicator_id, start_date))
+  rows = cursor.fetchall()
+  return pd.Series([row['value'] for row in rows],
+                   index=pd.to_datetime([row['date'] for row in rows]), dtype=float)
+
+
+def diff_against_stored(df, stored):
+  fetched = df["value"].astype(float).to_numpy()
+  previous = stored.reindex(pd.to_datetime(df.index.date)).to_numpy()
+  is_new = np.isnan(previous)
+  is_unchanged = np.isclose(fetched, previous, rtol=VALUE_TOLERANCE, atol=1e-9)
+  is_revised = ~is_new & ~is_unchanged
+  counts = {
+      "new": int(is_new.sum()),
+      "revised": int(is_revised.sum()),
+      "unchanged": int(is_unchanged.sum()),
+  }
+  return df[is_new | is_revised], counts
+
+
+def upsert_historical_data(cursor, indicator_id, df):
+  rows = historical_rows(indicator_id, df)
+  for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+    cursor.executemany(
+        db.upsert_statement("historical_data", ("indicator_id", "date", "value"), ("indicator_id", "date")),
+        rows[i:i + UPSERT_CHUNK_SIZE])
+
+
+def infer_frequency(index):
+  if len(index) < 3:
+    return None
+  spacing = np.median(np.diff(index.values).astype('timedelta64[D]').astype(int))
+  for code, days in FREQUENCY_DAYS.items():
+    if spacing <= days * 1.5:
+      return code
+  return "A"
+
+
+def update_rollups(cursor, indicator_id, since=None):
+  # Recomputes every period that contains a point on or after `since`. A week
+  # can start before the month of `since`, so rows are read from the earliest
+  # period start of any rollup.
+  first_start = min(pd.Timestamp(since or "1900-01-01").to_period(period).start_time for _, period, _ in ROLLUPS)
+  stored = load_stored_values(cursor, indicator_id, first_start.date())
+  for table, period, days in ROLLUPS:
+    start = pd.Timestamp(since or "1900-01-01").to_period(period).start_time
+    values = stored[stored.index >= start]
+    if values.empty:
+      continue
+    frame = pd.DataFrame({"date": values.index, "value": values.to_numpy()})
+    grouped = frame.groupby(values.index.to_period(period).start_time).agg(
+        date=("date", "max"), last=("value", "last"), min=("value", "min"),
+        max=("value", "max"), mean=("value", "mean"), count=("value", "count"))
+    rows = list(zip([indicator_id] * len(grouped), grouped.index.date, grouped["date"].dt.date,
+                    grouped["last"].tolist(), grouped["min"].tolist(), grouped["max"].tolist(),
+                    grouped["mean"].tolist(), grouped["count"].tolist()))
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+      cursor.executemany(
+          db.upsert_statement(table, ("indicator_id", "period_start", "date", "last_value", "min_value", "max_value",
+                                      "mean_value", "count"), ("indicator_id", "period_start")),
+          rows[i:i + UPSERT_CHUNK_SIZE])
+
+
+def update_summary_stats(cursor, indicator_id):
+  # Index range scans over (indicator_id, date) for this indicator only
+  cursor.execute(
+      "SELECT COUNT(*) AS row_count, MIN(date) AS min_date, MAX(date) AS max_date FROM historical_data WHERE indicator_id = %s",
+      (indicator_id,))
+  summary = cursor.fetchone()
+  cursor.execute("UPDATE indicators SET row_count = %s, min_date = %s, max_date = %s WHERE id = %s",
+                 (summary['row_count'], summary['min_date'], summary['max_date'], indicator_id))
+
+
+def backfill_summary_stats(conn, cursor):
+  # Fills the summary columns of indicators stored before they existed
+  cursor.execute("SELECT id FROM indicators WHERE row_count IS NULL")
+  for row in cursor.fetchall():
+    update_summary_stats(cursor, row['id'])
+  conn.commit()
+
+
+def backfill_rollups(conn, cursor):
+  # Builds rollups for indicators stored before the rollup tables existed
+  table = ROLLUPS[-1][0]
+  cursor.execute(
+      f"SELECT i.id, i.name FROM indicators i WHERE NOT EXISTS (SELECT 1 FROM {table} r WHERE r.indicator_id = i.id)")
+  for row in cursor.fetchall():
+    try:
+      update_rollups(cursor, row['id'])
+      conn.commit()
+      logging.info(f"Built rollups for {row['name']}.")
+    except db.Error as err:
+      logging.error(f"Database error building rollups for {row['name']}: {err}")
+      conn.rollback()
+
+
+def get_indicator_id(cursor, name, units):
+  # Insert or update indicator in the indicators table
+  cursor.execute(
+      db.upsert_statement("indicators", ("name", "units"), ("name",), ["last_updated = CURRENT_TIMESTAMP"]),
+      (name, units))
+  cursor.execute("SELECT id FROM indicators WHERE name = %s", (name,))
+  return cursor.fetchone()['id']
+
+
+def write_indicator(conn, cursor, name, units, df, stats, changed):
+  started = time.perf_counter()
+  try:
+    indicator_id = get_indicator_id(cursor, name, units)
+
+    # Only send points that are new or whose value was revised upstream
+    stored = load_stored_values(cursor, indicator_id, df.index.min().date())
+    changes, counts = diff_against_stored(df, stored)
+    upsert_historical_data(cursor, indicator_id, changes)
+    if len(changes):
+      update_rollups(cursor, indicator_id, min(changes.index.date))
+      update_summary_stats(cursor, indicator_id)
+      frequency = infer_frequency(df.index)
+      if frequency:
+        cursor.execute("UPDATE indicators SET frequency = %s WHERE id = %s", (frequency, indicator_id))
+    conn.commit()
+  except db.Error as err:
+    logging.error(f"Database error for {name}: {err}")
+    conn.rollback()
+    return
+  except Exception as e:
+    logging.error(f"An unexpected error occurred for {name}: {e}")
+    conn.rollback()
+    return
+
+  elapsed = time.perf_counter() - started
+  DB_WRITE_SECONDS.observe(elapsed, indicator=name)
+  DB_ROWS_WRITTEN.inc(len(changes), indicator=name)
+  stats["indicators"][name] = counts
+  for key, count in counts.items():
+    stats["total"][key] += count
+    REFRESH_POINTS.inc(count, result=key)
+  if len(changes):
+    changed[name] = changes
+  logging.info(f"For {name} (units: {units}): Inserted {counts['new']} new entries, Updated {counts['revised']} revised entries, "
+               f"Skipped {counts['unchanged']} unchanged entries in 'historical_data' in {elapsed:.3f}s "
+               f"({len(changes) / elapsed if elapsed else 0:.0f} rows/s).")
+
+
+def load_series(cursor, names, start_date=None):
+  placeholders = ", ".join(["%s"] * len(names))
+  query = f"SELECT i.name, h.date, h.value FROM historical_data h JOIN indicators i ON h.indicator_id = i.id WHERE i.name IN ({placeholders})"
+  params = list(names)
+  if start_date is not None:
+    query += " AND h.date >= %s"
+    params.append(start_date)
+  cursor.execute(query + " ORDER BY h.date", params)
+  data = pd.DataFrame(cursor.fetchall(), columns=['name', 'date', 'value'])
+  data['date'] = pd.to_datetime(data['date'])
+  return {name: data.loc[data['name'] == name].set_index('date')['value'].astype(float) for name in names}
+
+
+def refresh_derived_indicators(conn, cursor, stats, changed, latest_dates):
+  for name, derived in DERIVED_INDICATORS.items():
+    changed_sources = [min(changed[source].index.date) for source in derived["sources"] if source in changed]
+    if name in latest_dates:
+      if not changed_sources:
+        continue
+      # Recompute from the first changed source point, with enough history before it
+      since = min(changed_sources)
+      start_date = since - timedelta(days=derived["lookback_days"])
+    else:
+      since = start_date = None
+
+    try:
+      sources = load_series(cursor, derived["sources"], start_date)
+    except db.Error as err:
+      logging.error(f"Database error loading sources for {name}: {err}")
+      set_load_state([name], "failed", error="database read failed")
+      continue
+    if any(series.empty for series in sources.values()):
+      logging.warning(f"Skipping {name} due to missing source data.")
+      set_load_state([name], "failed", error="missing source data")
+      continue
+
+    values = derived["compute"](sources).dropna()
+    if since is not None:
+      values = values[values.index >= pd.Timestamp(since)]
+    if values.empty:
+      continue
+    logging.info(f"Computed {len(values)} entries for {name}" + (f" since {since}." if since else " over the full history."))
+    write_indicator(conn, cursor, name, derived["units"], values.to_frame("value"), stats, changed)
+
+
+def refresh_data(indicator_names=None, full_refresh=False, fresh=False):
+  # fresh=True fetches FRED observations from upstream only, without the
+  # response cache or its stale fallback
+  global last_refresh_stats
   conn = None
   cursor = None
   logging.info("Starting refresh_data function.")
+  refresh_started = time.perf_counter()
   try:
-    conn = mysql.connector.connect(
-        host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+    conn = db.get_connection()
     cursor = conn.cursor(dictionary=True)
 
-    start_date = (datetime.today() - timedelta(days=20 * 365)
-                  ).strftime('%Y-%m-%d')
+    backfill_rollups(conn, cursor)
+    backfill_summary_stats(conn, cursor)
+    latest_dates = get_latest_dates(cursor)
+
+    # Entries past the longest TTL would only ever serve as stale fallbacks
+    pruned = upstream.cache.prune(max(HTTP_CACHE_METADATA_TTL, HTTP_CACHE_OBSERVATIONS_TTL))
+    if pruned:
+      logging.info(f"Removed {pruned} expired response cache entries.")
 
     indicators_to_fetch = INDICATORS
     if indicator_names:
       indicators_to_fetch = {name: INDICATORS[name]
                              for name in indicator_names if name in INDICATORS}
 
-    updated = False
+    fetch_plan = {}
     for name, series_id in indicators_to_fetch.items():
-      logging.info(f"Fetching data for indicator: {name} (Series ID: {series_id})")
-      df = None
-      units = None
-      if name == "S&P 500 Index":
-        df = fetch_sp500_data(start_date)
-        units = "Points"  # S&P 500 is in points
-        if df is None:
-          # If S&P 500 data from yfinance fails, try FRED as a fallback
-          df, units = fetch_fred_data(series_id, start_date)
+      latest_date = latest_dates.get(name)
+      start_date = get_fetch_start_date(latest_date, full_refresh)
+      if full_refresh or latest_date is None:
+        logging.info(f"Fetching full history for indicator: {name} (Series ID: {series_id}) from {start_date}")
       else:
-        df, units = fetch_fred_data(series_id, start_date)
+        logging.info(f"Fetching data for indicator: {name} (Series ID: {series_id}) from {start_date} (latest stored: {latest_date})")
+      fetch_plan[name] = (series_id, start_date)
+    set_load_state(fetch_plan, "fetching")
+
+    fetched = fetch_indicators(fetch_plan, fresh)
 
+    # Persist serially, in indicator order, over the single connection
+    changed = {}
+    stats = {"indicators": {}, "total": {"new": 0, "revised": 0, "unchanged": 0}}
+    for name in fetch_plan:
+      df, units = fetched[name]
       if df is not None:
         logging.info(f"Fetched {len(df)} entries for {name}.")
-        try:
-          # Insert or update indicator in the indicators table
-          cursor.execute(
-              "INSERT INTO indicators (name, units) VALUES (%s, %s) ON DUPLICATE KEY UPDATE units = %s, last_updated = CURRENT_TIMESTAMP",
-              (name, units, units))
-          conn.commit()
-          logging.info(f"Indicator {name} (units: {units}) updated in 'indicators' table.")
-
-          # Get the indicator_id
-          cursor.execute("SELECT id FROM indicators WHERE name = %s", (name,))
-          indicator_id = cursor.fetchone()['id']
-
-          inserted_count = 0
-          updated_count = 0
-          for date, row in df.iterrows():
-            try:
-                cursor.execute("INSERT INTO historical_data (indicator_id, date, value) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE value = %s",
-                               (indicator_id, date.date(), row['value'], row['value']))
-                if cursor.rowcount == 1: # 1 for insert, 2 for update
-                    inserted_count += 1
-                elif cursor.rowcount == 2:
-                    updated_count += 1
-                updated = True
-            except mysql.connector.Error as err:
-                logging.error(f"Database error inserting/updating data for {name} on {date.date()}: {err}")
-                conn.rollback()
-                break # Stop processing this indicator if an error occurs
-          conn.commit()
-          logging.info(f"For {name}: Inserted {inserted_count} new entries, Updated {updated_count} existing entries in 'historical_data'.")
-        except mysql.connector.Error as err:
-          logging.error(f"Database error for {name}: {err}")
-          conn.rollback()
-        except Exception as e:
-          logging.error(f"An unexpected error occurred for {name}: {e}")
-          conn.rollback()
+        write_indicator(conn, cursor, name, units, df, stats, changed)
+        if name in stats["indicators"]:
+          set_load_state([name], "loaded", points=len(df))
+        else:
+          set_load_state([name], "failed", error="database write failed")
       else:
         logging.warning(f"Skipping {name} due to no data fetched.")
+        set_load_state([name], "failed", error="no data fetched")
+      logging.info(f"Stored {len(stats['indicators'])} of {len(fetch_plan)} fetched indicators.")
+
+    refresh_derived_indicators(conn, cursor, stats, changed, latest_dates)
+    set_load_state([name for name in DERIVED_INDICATORS if name in stats["indicators"]], "loaded")
+    updated = bool(changed)
+
+    last_refresh_stats = stats
+    logging.info(f"Refresh totals: {stats['total']['new']} new, {stats['total']['revised']} revised, "
+                 f"{stats['total']['unchanged']} unchanged points.")
 
     if updated:
-      update_event.set()
-      logging.info("update_event signaled due to data changes.")
+      invalidate_data_cache(list(changed))
+      if PREWARM_RENDER_CACHE:
+        Thread(target=prewarm_render_cache, daemon=True).start()
+      event_hub.publish("update", build_update_event(changed))
+      logging.info(f"Update event published for {len(changed)} changed indicators.")
+    return stats
 
-  except mysql.connector.Error as err:
+  except db.Error as err:
     logging.error(f"Connection error: {err}")
   except Exception as e:
     logging.error(f"An unexpected error occurred during refresh_data: {e}")
@@ -262,164 +838,657 @@ def refresh_data(indicator_names=None):
       cursor.close()
     if conn:
       conn.close()
-    logging.info("Finished refresh_data function.")
+    REFRESH_SECONDS.observe(time.perf_counter() - refresh_started)
+    logging.info(f"Finished refresh_data function in {time.perf_counter() - refresh_started:.2f}s.")
 
 
-def get_data_from_db(time_range):
-  conn = mysql.connector.connect(
-      host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
-  cursor = conn.cursor()
+def choose_resolution(frequency, range_days):
+  # Coarsest rollup that is finer than the series itself and still leaves at
+  # least DOWNSAMPLE_POINTS points across the range
+  native_days = FREQUENCY_DAYS.get(frequency)
+  if native_days is None:
+    return None
+  for table, period, days in ROLLUPS:
+    if native_days < days and range_days / days >= DOWNSAMPLE_POINTS:
+      return table
+  return None
 
-  start_date = get_start_date(time_range)
+
+def read_series(start_date):
+  conn = db.get_connection()
+  cursor = conn.cursor()
+  range_days = (datetime.today() - datetime.strptime(start_date, '%Y-%m-%d')).days
 
   data_frames = {}
   indicator_units = {}
-  for name, series_id in INDICATORS.items():
-    cursor.execute(
-        "SELECT h.date, h.value, i.units FROM historical_data h JOIN indicators i ON h.indicator_id = i.id WHERE i.name = %s AND h.date >= %s", (name, start_date))
-    data = cursor.fetchall()
-    if data:
-      df = pd.DataFrame(data, columns=['date', 'value', 'units'])
-      units = df['units'].iloc[0]  # Get the unit from the first row
-      df = df.drop(columns=['units'])
-      df['date'] = pd.to_datetime(df['date'])
-      df = df.set_index('date')
-      if time_range in ['3y', '5y'] and (name == "S&P 500 Index" or "Treasury Yield" in name):
-        df = df.resample('W').last()
-      if time_range in ['10y', '20y'] and (name == "S&P 500 Index" or "Treasury Yield" in name):
-        df = df.resample('ME').last()
-      data_frames[name] = df
-      indicator_units[name] = units
+  try:
+    cursor.execute("SELECT id, name, units, frequency FROM indicators")
+    indicators = {}
+    sources = {}
+    for indicator_id, name, units, frequency in cursor.fetchall():
+      if name in INDICATORS or name in DERIVED_INDICATORS:
+        indicators[indicator_id] = (name, units)
+        sources.setdefault(choose_resolution(frequency, range_days), []).append(indicator_id)
+    if not indicators:
+      return data_frames, indicator_units
 
-  cursor.close()
-  conn.close()
+    # One statement for all indicators, each read from raw rows or its rollup
+    selects = []
+    params = []
+    for table, ids in sources.items():
+      placeholders = ", ".join(["%s"] * len(ids))
+      if table is None:
+        selects.append(f"SELECT indicator_id, date, value FROM historical_data WHERE indicator_id IN ({placeholders}) AND date >= %s")
+      else:
+        selects.append(f"SELECT indicator_id, date, last_value FROM {table} WHERE indicator_id IN ({placeholders}) AND period_start >= %s")
+      params.extend(ids)
+      params.append(start_date)
+    cursor.execute(" UNION ALL ".join(selects) + " ORDER BY indicator_id, date", params)
+    data = pd.DataFrame(cursor.fetchall(), columns=['indicator_id', 'date', 'value'])
+  finally:
+    cursor.close()
+    conn.close()
+
+  data['date'] = pd.to_datetime(data['date'])
+  data['value'] = data['value'].astype(float)
+  for indicator_id, group in data.groupby('indicator_id', sort=False):
+    name, units = indicators[indicator_id]
+    data_frames[name] = group[['date', 'value']].set_index('date')
+    indicator_units[name] = units
   return data_frames, indicator_units
 
 
-@app.route('/')
-def index():
-  time_range = request.args.get('time_range', '5y')
-  data_frames, indicator_units = get_data_from_db(time_range)
-
-  # Handle calculated indicators and their units
-  if "PCE (Inflation)" in data_frames and data_frames["PCE (Inflation)"] is not None:
-    df_pce = data_frames["PCE (Inflation)"].copy()
-    df_pce["value"] = df_pce["value"].pct_change(periods=12) * 100
-    data_frames["Inflation Rate"] = df_pce[["value"]]
-    indicator_units["Inflation Rate"] = "Percent"
-
-  if "GDP" in data_frames and data_frames["GDP"] is not None:
-    df_gdp = data_frames["GDP"].copy()
-    df_gdp["value"] = df_gdp["value"].pct_change(periods=1) * 400
-    data_frames["GDP Change"] = df_gdp[["value"]]
-    indicator_units["GDP Change"] = "Percent"
-
-  # Combine Treasury Yields and assign a common unit
-  treasury_yields = {}
-  if "2-Year Treasury Yield" in data_frames and data_frames["2-Year Treasury Yield"] is not None:
-    treasury_yields["2-Year"] = data_frames["2-Year Treasury Yield"]["value"]
-    del data_frames["2-Year Treasury Yield"]
-    del indicator_units["2-Year Treasury Yield"]
-  if "10-Year Treasury Yield" in data_frames and data_frames["10-Year Treasury Yield"] is not None:
-    treasury_yields["10-Year"] = data_frames["10-Year Treasury Yield"]["value"]
-    del data_frames["10-Year Treasury Yield"]
-    del indicator_units["10-Year Treasury Yield"]
-  if "20-Year Treasury Yield" in data_frames and data_frames["20-Year Treasury Yield"] is not None:
-    treasury_yields["20-Year"] = data_frames["20-Year Treasury Yield"]["value"]
-    del data_frames["20-Year Treasury Yield"]
-    del indicator_units["20-Year Treasury Yield"]
-
-  if treasury_yields:
-    df_treasury = pd.DataFrame(treasury_yields)
-    data_frames["Treasury Yields"] = df_treasury
-    indicator_units["Treasury Yields"] = "Percent"
-
-  # Define the desired plot order
-  PLOT_ORDER = [
-      "GDP",
-      "GDP Change",
-      "PCE (Inflation)",
-      "Inflation Rate",
-      "S&P 500 Index",
-      "Treasury Yields",
-      "Unemployment Rate",
-      "Initial Jobless Claims",
-      "Corporate Profits",
-      "Industrial Production",
-      "Consumer Sentiment",
-      "Retail Sales",
-      "Federal Funds Rate",
-      "M2 Money Supply",
-      "ISM Manufacturing PMI",
-      "Producer Price Index",
-      "Housing Starts",
-      "Trade Balance",
-      "Money Market Funds",
-  ]
+def load_data_frames(time_range, start_date):
+  with DATA_QUERY_SECONDS.time(time_range=time_range, phase="query"):
+    data_frames, indicator_units = read_series(start_date)
+  with DATA_QUERY_SECONDS.time(time_range=time_range, phase="downsample"):
+    for name, df in data_frames.items():
+      data_frames[name] = downsampling.downsample(df, DOWNSAMPLE_POINTS, DOWNSAMPLE_METHOD)
+  return data_frames, indicator_units
+
+
+def invalidate_data_cache(changed_indicators=()):
+  global data_version, data_last_modified
+  with data_cache_lock:
+    for name in changed_indicators:
+      indicator_versions[name] = indicator_versions.get(name, 0) + 1
+    data_version += 1
+    data_last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+    data_cache.clear()
+
+
+def get_data_from_db(time_range, start_date=None):
+  # Ranges end today, so an entry loaded on an earlier day is not reused
+  start_date = start_date or get_start_date(time_range)
+  with data_cache_lock:
+    version = data_version
+    cached = data_cache.get(time_range)
+  if cached is not None and cached[0] != start_date:
+    cached = None
+  DATA_CACHE_REQUESTS.inc(result="miss" if cached is None else "hit")
+  if cached is None:
+    cached = (start_date, *load_data_frames(time_range, start_date))
+    with data_cache_lock:
+      # Drop the result if a refresh committed new data while it was loading
+      if version == data_version:
+        data_cache[time_range] = cached
+  _, data_frames, indicator_units = cached
+  # Callers add and remove entries, so hand out copies of the cached dicts
+  return dict(data_frames), dict(indicator_units)
+
+
+def normalize_time_range(time_range):
+  return time_range if time_range in TIME_RANGES else DEFAULT_TIME_RANGE
+
+
+def build_tile_frames(time_range, start_date):
+  data_frames, indicator_units = get_data_from_db(time_range, start_date)
+
+  # Combine the indicators of multi-line tiles and assign the unit of the first one
+  for tile_name, sources in TILE_SOURCES.items():
+    lines = {name: data_frames[name]["value"] for name in sources if data_frames.get(name) is not None}
+    if lines:
+      units = next(indicator_units.get(name) for name in sources if name in lines)
+      data_frames[tile_name] = pd.DataFrame(lines)
+      indicator_units[tile_name] = units
 
   # Filter and order data_frames based on PLOT_ORDER
-  ordered_data_frames = []
+  tile_frames = {}
   for indicator_name in PLOT_ORDER:
     if indicator_name in data_frames and data_frames[indicator_name] is not None:
-      ordered_data_frames.append(
-        (indicator_name, data_frames[indicator_name]))
-
-  # Determine number of rows for subplots
-  num_plots = len(ordered_data_frames)
-  nrows = (num_plots + 1) // 2  # Calculate rows needed for 2 columns
-
-  fig, axes = plt.subplots(nrows=nrows, ncols=2, figsize=(16, nrows * 4))
-  fig.suptitle(f"Key US Economic Indicators (Last {time_range})")
-
-  for ax, (name, df) in zip(axes.flatten(), ordered_data_frames):
-    if df is not None:
-      if name == "Treasury Yields":
-        for col in df.columns:
-          ax.plot(df.index, df[col], label=col +
-                  " Treasury Yield", linewidth=1)
-        ax.set_ylabel("Percent")
-      else:
-        ax.plot(df.index, df["value"], label=name, linewidth=1)
-        ax.set_ylabel(indicator_units.get(name, "Value")) # Use stored unit or default to "Value"
-      ax.legend()
-      ax.grid(True)
+      tile_frames[indicator_name] = (data_frames[indicator_name], indicator_units.get(indicator_name))
+  return tile_frames
+
+
+def get_tile_versions():
+  with data_cache_lock:
+    return {name: tuple(indicator_versions.get(source, 0) for source in TILE_SOURCES.get(name, [name]))
+            for name in PLOT_ORDER}
+
+
+def get_tile_version_tag(versions, start_date):
+  return f"{DATA_EPOCH}-{start_date.replace('-', '')}-{'.'.join(str(v) for v in versions)}"
+
+
+def submit_tile_render(name, df, units):
+  # With RENDER_WORKERS=0 the Future is left unresolved for the caller to
+  # complete with run_tile_render() once it no longer holds tile_lock
+  global render_pool
+  if RENDER_WORKERS <= 0:
+    return Future()
+  if render_pool is None:
+    # Spawned workers re-run the top level of the main module (app.py itself
+    # when started directly, but not its __main__ block) before importing charts
+    render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                      mp_context=multiprocessing.get_context('spawn'))
+  return render_pool.submit(charts.render_tile_timed, name, df, units)
+
+
+def run_tile_render(future, name, df, units):
+  try:
+    future.set_result(charts.render_tile_timed(name, df, units))
+  except Exception as e:
+    future.set_exception(e)
+
+
+def ensure_tiles(time_range, names=None):
+  # Returns {tile name: (version tag, PNG bytes)}. Tiles are reused while
+  # neither their source versions nor the start of the range (which moves
+  # every day) changed.
+  start_date = get_start_date(time_range)
+  # Snapshot versions before loading data, so a concurrent refresh can only
+  # make a tile look older than its data, never newer
+  versions = get_tile_versions()
+  tile_frames = build_tile_frames(time_range, start_date)
+
+  tiles = {}
+  pending = {}
+  # Renders this request runs itself when there are no worker processes
+  inline = {}
+  with tile_lock:
+    for name, (df, units) in tile_frames.items():
+      if names is not None and name not in names:
+        continue
+      cached = tile_cache.get((name, time_range))
+      if cached is not None and cached[:2] == (start_date, versions[name]):
+        tiles[name] = (get_tile_version_tag(versions[name], start_date), cached[2])
+        continue
+      key = (name, time_range, start_date, versions[name])
+      if key not in tile_futures:
+        tile_futures[key] = submit_tile_render(name, df, units)
+        if RENDER_WORKERS <= 0:
+          inline[name] = (df, units)
+      pending[name] = tile_futures[key]
+
+  # Outside the lock, so other requests keep getting cached tiles meanwhile
+  for name, (df, units) in inline.items():
+    run_tile_render(pending[name], name, df, units)
+
+  # Missing tiles render in parallel across the worker processes
+  for name, future in pending.items():
+    key = (name, time_range, start_date, versions[name])
+    try:
+      png, phases = future.result()
+    finally:
+      with tile_lock:
+        submitted_here = tile_futures.pop(key, None) is not None
+    if submitted_here:
+      # Requests sharing a render record its timings once
+      for phase, seconds in phases.items():
+        TILE_RENDER_SECONDS.observe(seconds, phase=phase)
+    with tile_lock:
+      cached = tile_cache.get((name, time_range))
+      if cached is None or cached[:2] < (start_date, versions[name]):
+        tile_cache[(name, time_range)] = (start_date, versions[name], png)
+    tiles[name] = (get_tile_version_tag(versions[name], start_date), png)
+  return {name: tiles[name] for name in tile_frames if name in tiles}
+
+
+def prewarm_render_cache():
+  started = time.perf_counter()
+  for time_range in TIME_RANGES:
+    try:
+      ensure_tiles(time_range)
+    except Exception as e:
+      logging.error(f"Error pre-rendering dashboard for {time_range}: {e}")
+  logging.info(f"Pre-rendered dashboard for {len(TIME_RANGES)} time ranges in {time.perf_counter() - started:.2f}s.")
+
+
+def get_data_version_tag():
+  with data_cache_lock:
+    return f"{int(data_last_modified.timestamp())}-{data_version}", data_last_modified
+
+
+def get_range_version_tag(time_range):
+  # Ranges end today, so what is served for one also changes when the day
+  # rolls over and moves its start date, even without new data
+  version_tag, last_modified = get_data_version_tag()
+  start_date = get_start_date(time_range)
+  day_started = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+  return f"{start_date.replace('-', '')}-{version_tag}", max(last_modified, day_started)
+
+
+@app.route('/')
+def index():
+  time_range = normalize_time_range(request.args.get('time_range', DEFAULT_TIME_RANGE))
+  # "client" draws the charts in the browser from /api/series instead of server-rendered tiles
+  mode = 'client' if request.args.get('mode') == 'client' else 'server'
+  range_tag, last_modified = get_range_version_tag(time_range)
+  etag = f"{time_range}-{mode}-{range_tag}"
+
+  # Let browsers revalidate without re-sending the page when the data has not changed
+  if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+    response = make_response("", 304)
+  elif mode == 'client':
+    tiles = [{"name": name, "sources": TILE_SOURCES.get(name, [name])} for name in PLOT_ORDER]
+    response = make_response(render_template(
+        'index.html', selected_time_range=time_range, mode=mode, client_tiles=tiles))
+  else:
+    slugs = {name: slug for slug, name in TILE_SLUGS.items()}
+    tiles = [(name, slugs[name], version_tag)
+             for name, (version_tag, png) in ensure_tiles(time_range).items()]
+    response = make_response(render_template(
+        'index.html', selected_time_range=time_range, mode=mode, tiles=tiles))
+  response.set_etag(etag)
+  response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  return response
+
+
+@app.route('/tile/<time_range>/<slug>.png')
+def tile(time_range, slug):
+  name = TILE_SLUGS.get(slug)
+  if time_range not in TIME_RANGES or name is None:
+    abort(404)
+  tiles = ensure_tiles(time_range, [name])
+  if name not in tiles:
+    abort(404)
+  version_tag, png = tiles[name]
+  _, last_modified = get_range_version_tag(time_range)
+  # Versioned URLs never change content since new data produces a new URL,
+  # anything else has to be revalidated
+  max_age = 365 * 24 * 3600 if request.args.get('v') == version_tag else 0
+  response = send_file(BytesIO(png), mimetype='image/png', max_age=max_age,
+                       etag=f"{time_range}-{slug}-{version_tag}", last_modified=last_modified, conditional=True)
+  response.cache_control.public = True
+  if max_age:
+    response.cache_control.immutable = True
+  else:
+    response.cache_control.no_cache = True
+  return response
+
+
+def read_full_series(names, start_date):
+  conn = db.get_connection()
+  cursor = conn.cursor()
+  try:
+    cursor.execute("SELECT name, units FROM indicators")
+    units = {name: unit for name, unit in cursor.fetchall() if name in names}
+    names = [name for name in names if name in units]
+    if not names:
+      return {}, {}
+    series = load_series(cursor, names, start_date)
+  finally:
+    cursor.close()
+    conn.close()
+  return {name: values.to_frame("value") for name, values in series.items() if not values.empty}, units
+
+
+def series_table(data_frames, indicator_units):
+  # Long format: one row per (indicator, date), units in the schema metadata
+  frames = [pd.DataFrame({"indicator": name, "date": df.index.date, "value": df["value"].to_numpy()})
+            for name, df in data_frames.items()]
+  long_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+      {"indicator": pd.Series(dtype=str), "date": pd.Series(dtype=object), "value": pd.Series(dtype=float)})
+  table = pa.Table.from_pandas(long_df, schema=pa.schema(
+      [("indicator", pa.string()), ("date", pa.date32()), ("value", pa.float64())]), preserve_index=False)
+  units = {name: indicator_units.get(name) for name in data_frames}
+  return table.replace_schema_metadata({"units": json.dumps(units)})
+
+
+@app.route('/api/series')
+def api_series():
+  time_range = normalize_time_range(request.args.get('time_range', DEFAULT_TIME_RANGE))
+  fmt = request.args.get('format', 'json')
+  if fmt not in ('json', 'arrow', 'parquet'):
+    abort(400, description="format must be json, arrow or parquet")
+  if fmt != 'json' and pa is None:
+    abort(406, description="Arrow and Parquet output require pyarrow")
+  # By default the chart-resolution series served to the dashboard, "full" reads every stored point
+  full = request.args.get('resolution') == 'full'
+  names = [name for value in request.args.getlist('indicators') for name in value.split(',') if name]
+  names += request.args.getlist('indicator')
 
-  # Hide any unused subplots
-  for i in range(num_plots, nrows * 2):
-    fig.delaxes(axes.flatten()[i])
+  version_tag, _ = get_data_version_tag()
+  # The range start moves every day, so it is part of the ETag
+  _, last_modified = get_range_version_tag(time_range)
+  query = json.dumps([time_range, get_start_date(time_range), fmt, full, sorted(names)])
+  etag = f"{hashlib.sha1(query.encode()).hexdigest()[:16]}-{version_tag}"
+  if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+    response = make_response("", 304)
+  else:
+    if full:
+      data_frames, indicator_units = read_full_series(
+          names or list(INDICATORS) + list(DERIVED_INDICATORS), get_start_date(time_range))
+    else:
+      data_frames, indicator_units = get_data_from_db(time_range)
+      if names:
+        data_frames = {name: df for name, df in data_frames.items() if name in names}
+
+    if fmt == 'json':
+      payload = {
+          "time_range": time_range,
+          "version": version_tag,
+          "series": {name: {
+              "units": indicator_units.get(name),
+              "dates": df.index.strftime('%Y-%m-%d').tolist(),
+              "values": [None if np.isnan(v) else v for v in df["value"].tolist()],
+          } for name, df in data_frames.items()},
+      }
+      response = make_response(json.dumps(payload, separators=(',', ':')))
+      response.mimetype = 'application/json'
+    else:
+      table = series_table(data_frames, indicator_units)
+      buf = BytesIO()
+      if fmt == 'arrow':
+        with pa.ipc.new_stream(buf, table.schema) as writer:
+          writer.write_table(table)
+        response = make_response(buf.getvalue())
+        response.mimetype = 'application/vnd.apache.arrow.stream'
+      else:
+        pq.write_table(table, buf)
+        response = make_response(buf.getvalue())
+        response.mimetype = 'application/vnd.apache.parquet'
+  response.set_etag(etag)
+  response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  return response
 
-  plt.tight_layout(rect=[0, 0, 1, 0.96])
 
-  buf = BytesIO()
-  plt.savefig(buf, format="png")
-  data = base64.b64encode(buf.getbuffer()).decode("ascii")
-  return render_template('index.html', plot_url=data, selected_time_range=time_range)
+def build_update_event(changed):
+  # Tiles to reload in server-rendered mode (new version per time range), and
+  # the new or revised points themselves for client-side mode when the delta
+  # is small enough
+  version_tag, _ = get_data_version_tag()
+  tile_versions = get_tile_versions()
+  start_dates = {time_range: get_start_date(time_range) for time_range in TIME_RANGES}
+  slugs = {name: slug for slug, name in TILE_SLUGS.items()}
+  tiles = {slugs[name]: {time_range: get_tile_version_tag(tile_versions[name], start_date)
+                         for time_range, start_date in start_dates.items()}
+           for name in PLOT_ORDER if any(source in changed for source in TILE_SOURCES.get(name, [name]))}
+  series = None
+  if sum(len(df) for df in changed.values()) <= SSE_MAX_DELTA_POINTS:
+    series = {name: {"dates": df.index.strftime('%Y-%m-%d').tolist(), "values": df["value"].astype(float).tolist()}
+              for name, df in changed.items()}
+  return json.dumps({"version": version_tag, "indicators": list(changed), "tiles": tiles, "series": series},
+                    separators=(',', ':'))
 
 
 @app.route('/subscribe')
 def subscribe():
-  def event_stream():
-    global update_event
-    while True:
-      update_event.wait()
-      yield "data: refresh\n\n"
-      update_event.clear()
-  return Response(event_stream(), mimetype='text/event-stream')
+  stream = event_hub.stream(request.headers.get('Last-Event-ID'), SSE_HEARTBEAT)
+  response = Response(stream, mimetype='text/event-stream')
+  response.cache_control.no_cache = True
+  # Keep reverse proxies from buffering the stream
+  response.headers['X-Accel-Buffering'] = 'no'
+  return response
+
+
+def get_poll_state(cursor):
+  cursor.execute("SELECT name, frequency, source_updated FROM indicators")
+  return {row['name']: row for row in cursor.fetchall()}
+
+
+def record_source_updated(updated):
+  conn = db.get_connection()
+  cursor = conn.cursor()
+  try:
+    for name, last_updated in updated.items():
+      cursor.execute("UPDATE indicators SET source_updated = %s WHERE name = %s", (last_updated, name))
+    conn.commit()
+  finally:
+    cursor.close()
+    conn.close()
+
+
+def refresh_changed(frequencies=None):
+  # Refreshes the series of the given native frequencies (all when None)
+  # whose FRED last_updated differs from the one stored with their data.
+  # Series without a stored frequency yet are polled with the daily ones.
+  with refresh_lock:
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+      state = get_poll_state(cursor)
+    finally:
+      cursor.close()
+      conn.close()
+
+    polled = [name for name in INDICATORS
+              if frequencies is None or (state.get(name, {}).get("frequency") or "D") in frequencies]
+    checked_at = datetime.now(timezone.utc)
+    due = {}
+    if "S&P 500 Index" in polled:
+      # Yahoo has no last_updated, so the index is refreshed on every poll
+      due["S&P 500 Index"] = None
+
+    # Series checked recently enough are covered by one series/updates listing,
+    # unless paging through it would cost more requests than asking for each
+    listed = [name for name in polled if name in last_checked and state.get(name, {}).get("source_updated")
+              and checked_at - last_checked[name] < FRED_UPDATES_WINDOW]
+    updates = None
+    if listed:
+      try:
+        # The hour of overlap covers series whose update became visible late
+        updates = fetch_fred_series_updates(min(last_checked[name] for name in listed) - timedelta(hours=1),
+                                            checked_at, len(listed))
+      except requests.exceptions.RequestException as e:
+        logging.warning(f"Could not list FRED series updates: {e}")
+    if updates is None:
+      listed = []
+    for name in listed:
+      last_updated = updates.get(INDICATORS[name])
+      if last_updated is not None and last_updated != state[name]["source_updated"]:
+        due[name] = last_updated
+      else:
+        last_checked[name] = checked_at
+
+    for name in polled:
+      if name in due or name in listed:
+        continue
+      stored = state.get(name, {})
+      try:
+        series_info = fetch_fred_series_info(INDICATORS[name], fresh=True)
+      except requests.exceptions.RequestException as e:
+        logging.warning(f"Could not check {name} for updates: {e}")
+        set_load_state([name], "failed", error=f"update check failed: {e}")
+        continue
+      last_updated = series_info.get("last_updated") if series_info else None
+      if last_updated is None or last_updated != stored.get("source_updated"):
+        due[name] = last_updated
+      else:
+        last_checked[name] = checked_at
+
+    logging.info(f"{len(due)} of {len(polled)} polled series changed upstream"
+                 f"{'' if frequencies is None else ' (frequency ' + ', '.join(frequencies) + ')'}.")
+    if not due:
+      return
+    # Observations of the due series must reflect the new last_updated, so a
+    # series whose fetch fails is not marked as handled and is retried next poll
+    stats = refresh_data(list(due), fresh=True)
+    if stats:
+      # Only series that were written are skipped until their next upstream update
+      handled = {name: last_updated for name, last_updated in due.items()
+                 if last_updated and name in stats["indicators"]}
+      record_source_updated(handled)
+      last_checked.update(dict.fromkeys(handled, checked_at))
+    if startup_state["phase"] == "degraded":
+      update_startup_phase()
+
+
+def init_load_state():
+  # Indicators that already have rows can be served before the initial load finishes
+  conn = db.get_connection()
+  cursor = conn.cursor(dictionary=True)
+  try:
+    stored = get_latest_dates(cursor)
+  finally:
+    cursor.close()
+    conn.close()
+  for name in list(INDICATORS) + list(DERIVED_INDICATORS):
+    set_load_state([name], "stored" if name in stored else "pending", has_data=name in stored)
 
 
 def initial_db_load():
-  create_database_and_tables()
+  startup_state.update(phase="loading", started_at=datetime.now(timezone.utc).isoformat(timespec='seconds'))
   print("Performing initial data load...")
   try:
-    refresh_data()
+    create_database_and_tables()
+    init_load_state()
+    refresh_changed()
     print("Initial data load complete.")
+    update_startup_phase()
+    if PREWARM_RENDER_CACHE:
+      Thread(target=prewarm_render_cache, daemon=True).start()
   except Exception as e:
     print(f"Error during initial data load: {e}")
+    startup_state.update(phase="failed", error=str(e))
+  finally:
+    startup_state["finished_at"] = datetime.now(timezone.utc).isoformat(timespec='seconds')
 
 
-if __name__ == '__main__':
-  initial_db_load()
+def count_indicators_with_data():
+  with load_state_lock:
+    return sum(entry["has_data"] for entry in load_state.values()), len(load_state)
+
+
+def update_startup_phase():
+  # After the initial load, and after polls that follow a degraded one
+  with_data, total = count_indicators_with_data()
+  if with_data >= READY_MIN_FRACTION * total:
+    startup_state.update(phase="ready", error=None)
+  else:
+    startup_state.update(phase="degraded", error=f"only {with_data} of {total} indicators have data")
+
+
+def is_ready():
+  # Ready once every indicator has data to serve, or the initial load is over
+  # with at least READY_MIN_FRACTION of them having data
+  if startup_state["phase"] == "ready":
+    return True
+  with_data, total = count_indicators_with_data()
+  return bool(total) and with_data == total
+
+
+def health_payload():
+  with load_state_lock:
+    indicators = {name: dict(entry) for name, entry in load_state.items()}
+  done = sum(entry["state"] in ("stored", "loaded", "failed") for entry in indicators.values())
+  return {"startup": dict(startup_state), "progress": {"done": done, "total": len(indicators)},
+          "indicators": indicators}
+
+
+@app.before_request
+def start_request_instrumentation():
+  g.request_started = time.perf_counter()
+  if PROFILING_ENABLED and request.args.get('profile'):
+    profiler = cProfile.Profile()
+    try:
+      profiler.enable()
+    except ValueError:
+      # Another request is being profiled in a different thread
+      return
+    g.profiler = profiler
+
+
+@app.after_request
+def finish_request_instrumentation(response):
+  profiler = g.pop('profiler', None)
+  if profiler is not None:
+    profiler.disable()
+    response = profile_response(profiler, request.args.get('profile'))
+  endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+  HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                               endpoint=endpoint, method=request.method, status=response.status_code)
+  return response
+
+
+def profile_response(profiler, mode):
+  if mode == 'prof':
+    # Same format as cProfile's -o output files
+    profiler.create_stats()
+    response = make_response(marshal.dumps(profiler.stats))
+    response.mimetype = 'application/octet-stream'
+    response.headers['Content-Disposition'] = 'attachment; filename="request.prof"'
+  else:
+    out = StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(60)
+    response = make_response(out.getvalue())
+    response.mimetype = 'text/plain'
+  response.cache_control.no_store = True
+  return response
+
+
+def update_scraped_metrics():
+  # Mirrors counters kept by the connection pool and the upstream client
+  pool = db.pool_stats()
+  for kind, query in pool.pop("queries").items():
+    DB_STATEMENTS.set(query["count"], kind=kind)
+    DB_STATEMENT_SECONDS.set(query["seconds"], kind=kind)
+  for stat, value in pool.items():
+    DB_POOL.set(value, stat=stat)
+  cache_stats = upstream.snapshot()
+  cache_stats.pop("open_circuits")
+  for result, count in cache_stats.items():
+    UPSTREAM_CACHE.set(count, result=result)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+  update_scraped_metrics()
+  response = make_response(metrics.render())
+  response.mimetype = 'text/plain'
+  response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+  response.cache_control.no_store = True
+  return response
+
+
+@app.route('/healthz')
+def healthz():
+  # Liveness: the process serves requests, whatever the state of the data
+  payload = dict(health_payload(), status="ok")
+  response = make_response(json.dumps(payload))
+  response.mimetype = 'application/json'
+  response.cache_control.no_store = True
+  return response
+
+
+@app.route('/readyz')
+def readyz():
+  ready = is_ready()
+  payload = dict(health_payload(), ready=ready)
+  response = make_response(json.dumps(payload), 200 if ready else 503)
+  response.mimetype = 'application/json'
+  response.cache_control.no_store = True
+  return response
+
+
+scheduler = None
+
+
+def start_background_jobs():
+  global scheduler
+  if BACKGROUND_INITIAL_LOAD:
+    Thread(target=initial_db_load, name="initial-load", daemon=True).start()
+  else:
+    initial_db_load()
   scheduler = BackgroundScheduler(timezone=pytz.timezone('US/Eastern'))
-  scheduler.add_job(refresh_data, 'cron', hour=16)
+  for frequency, hours in POLL_INTERVAL_HOURS.items():
+    scheduler.add_job(refresh_changed, 'interval', hours=hours, args=[[frequency]], id=f"poll_{frequency}",
+                      coalesce=True, max_instances=1)
   scheduler.start()
+
+
+if __name__ == '__main__':
+  start_background_jobs()
   app.run(debug=True, host='0.0.0.0', port=5001)
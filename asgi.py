@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+from a2wsgi import WSGIMiddleware
+
+import app as dashboard
+
+# Threads serving the Flask routes (page, tiles, API). SSE subscribers are
+# coroutines on the event loop and never hold one of them.
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", 16))
+
+flask_app = WSGIMiddleware(dashboard.app, workers=WORKER_THREADS)
+
+
+async def subscribe(scope, receive, send):
+  headers = dict(scope["headers"])
+  last_event_id = headers.get(b"last-event-id", b"").decode("latin-1") or None
+  await send({
+      "type": "http.response.start",
+      "status": 200,
+      "headers": [
+          (b"content-type", b"text/event-stream; charset=utf-8"),
+          (b"cache-control", b"no-cache"),
+          (b"x-accel-buffering", b"no"),
+      ],
+  })
+
+  async def pump():
+    async for chunk in dashboard.event_hub.astream(last_event_id, dashboard.SSE_HEARTBEAT):
+      await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+  async def wait_for_disconnect():
+    while (await receive())["type"] != "http.disconnect":
+      pass
+
+  tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_for_disconnect())]
+  try:
+    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+  finally:
+    for task in tasks:
+      task.cancel()
+
+
+async def lifespan(scope, receive, send):
+  while True:
+    message = await receive()
+    if message["type"] == "lifespan.startup":
+      # Initial load and scheduler run off the event loop, as under app.run()
+      asyncio.get_running_loop().run_in_executor(None, dashboard.start_background_jobs)
+      await send({"type": "lifespan.startup.complete"})
+    elif message["type"] == "lifespan.shutdown":
+      if dashboard.scheduler:
+        dashboard.scheduler.shutdown(wait=False)
+      await send({"type": "lifespan.shutdown.complete"})
+      return
+
+
+async def application(scope, receive, send):
+  if scope["type"] == "lifespan":
+    await lifespan(scope, receive, send)
+  elif scope["type"] == "http" and scope["path"] == "/subscribe":
+    await subscribe(scope, receive, send)
+  else:
+    await flask_app(scope, receive, send)
+
+
+if __name__ == '__main__':
+  import uvicorn
+  # A single process: the refresh scheduler and the event hub live in it
+  uvicorn.run(application, host='0.0.0.0', port=5001)
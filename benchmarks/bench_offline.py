@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+parser = argparse.ArgumentParser(
+    description="Measure refresh, query and render performance end to end against a local FRED/Yahoo stand-in.")
+parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite",
+                    help="sqlite uses a temporary file; mysql uses the MYSQL_* settings, e.g. a scratch container.")
+parser.add_argument("--reset", action="store_true",
+                    help="Required with --backend mysql: the run empties the configured database first.")
+parser.add_argument("--recordings", help="Replay FRED responses recorded with fred_stub.py --record instead of synthetic data.")
+parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stand-in adds to every upstream response.")
+parser.add_argument("--min-interval", type=float, default=0.0,
+                    help="FETCH_MIN_INTERVAL during the run (default 0, so the per-host rate limit does not dominate).")
+parser.add_argument("--iterations", type=int, default=10, help="Timed queries and renders per time range.")
+parser.add_argument("--workers", type=int, default=0, help="RENDER_WORKERS to use.")
+parser.add_argument("--output", help="Also write the JSON report to this file.")
+parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+
+def percentiles(samples):
+  return {
+      "p50_ms": float(np.percentile(samples, 50) * 1000),
+      "p95_ms": float(np.percentile(samples, 95) * 1000),
+      "max_ms": float(np.max(samples) * 1000),
+  }
+
+
+def reset_database(app, db):
+  conn = db.get_connection()
+  cursor = conn.cursor()
+  try:
+    for table in ["historical_data"] + [table for table, period, days in app.ROLLUPS] + ["indicators"]:
+      cursor.execute(f"DELETE FROM {table}")
+    conn.commit()
+  finally:
+    cursor.close()
+    conn.close()
+
+
+def timed_refresh(app, stub, label, **kwargs):
+  upstream_before = stub.snapshot()
+  started = time.perf_counter()
+  stats = app.refresh_data(**kwargs) or {"total": {"new": 0, "revised": 0, "unchanged": 0}, "indicators": {}}
+  elapsed = time.perf_counter() - started
+  upstream_after = stub.snapshot()
+  written = stats["total"]["new"] + stats["total"]["revised"]
+  return {
+      "label": label,
+      "seconds": elapsed,
+      "indicators": len(stats["indicators"]),
+      "points": stats["total"],
+      "rows_per_second": written / elapsed if elapsed else 0.0,
+      "upstream_requests": {endpoint: count - upstream_before["requests"][endpoint]
+                            for endpoint, count in upstream_after["requests"].items()},
+      "upstream_bytes": upstream_after["bytes_sent"] - upstream_before["bytes_sent"],
+  }
+
+
+def fetch_dashboard(client, time_range):
+  page = client.get(f"/?time_range={time_range}")
+  for src in re.findall(r'src="([^"]+)"', page.get_data(as_text=True)):
+    client.get(src.replace("&amp;", "&"))
+
+
+def git_commit():
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                          text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def main():
+  args = parser.parse_args()
+  if args.backend == "mysql" and not args.reset:
+    parser.error("--backend mysql empties the configured database; pass --reset to confirm")
+
+  # Configuration is read when app and db are imported, so it is set up first
+  workdir = tempfile.mkdtemp(prefix="bench_offline_")
+  os.environ["STORAGE_BACKEND"] = args.backend
+  os.environ["SQLITE_PATH"] = os.path.join(workdir, "bench.db")
+  os.environ["HTTP_CACHE_DIR"] = os.path.join(workdir, "http_cache")
+  os.environ["FETCH_MIN_INTERVAL"] = str(args.min_interval)
+  os.environ["RENDER_WORKERS"] = str(args.workers)
+  os.environ["PREWARM_RENDER_CACHE"] = "false"
+  os.environ.setdefault("FRED_API_KEY", "offline")
+
+  from fred_stub import FredStub
+
+  stub = FredStub(None, args.recordings, args.latency)
+  os.environ["FRED_API_URL"] = stub.start()
+
+  import app
+  import db
+  import synthetic
+
+  stub.history = synthetic.synthetic_history
+  app.yf.Ticker = stub.ticker
+
+  app.create_database_and_tables()
+  reset_database(app, db)
+
+  refreshes = [
+      # Empty database: every series gets the full 20-year backfill
+      timed_refresh(app, stub, "cold"),
+      # Nothing changed upstream: the revision window is fetched and diffed, nothing written
+      timed_refresh(app, stub, "incremental"),
+  ]
+  # Re-download everything instead of replaying the responses of the cold run from the response cache
+  shutil.rmtree(os.environ["HTTP_CACHE_DIR"], ignore_errors=True)
+  refreshes.append(timed_refresh(app, stub, "full", full_refresh=True))
+
+  client = app.app.test_client()
+  queries = {}
+  renders = {}
+  for time_range in app.TIME_RANGES:
+    cold = []
+    warm = []
+    for _ in range(args.iterations):
+      app.invalidate_data_cache()
+      started = time.perf_counter()
+      app.get_data_from_db(time_range)
+      cold.append(time.perf_counter() - started)
+      started = time.perf_counter()
+      app.get_data_from_db(time_range)
+      warm.append(time.perf_counter() - started)
+    queries[time_range] = {"cold": percentiles(cold), "cached": percentiles(warm)}
+
+    # Untimed pass so imports, font caches and the worker pool are set up
+    fetch_dashboard(client, time_range)
+    latencies = []
+    for _ in range(args.iterations):
+      app.tile_cache.clear()
+      app.invalidate_data_cache()
+      started = time.perf_counter()
+      fetch_dashboard(client, time_range)
+      latencies.append(time.perf_counter() - started)
+    renders[time_range] = percentiles(latencies)
+
+  report = {
+      "commit": git_commit(),
+      "python": platform.python_version(),
+      "backend": args.backend,
+      "data": "recorded" if args.recordings else "synthetic",
+      "upstream_latency_s": args.latency,
+      "iterations": args.iterations,
+      "render_workers": args.workers,
+      "refresh": refreshes,
+      "query": queries,
+      "render": renders,
+  }
+  stub.stop()
+  if app.render_pool is not None:
+    app.render_pool.shutdown()
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(report, f, indent=2)
+
+  if args.json:
+    print(json.dumps(report, indent=2))
+  else:
+    print(f"Backend {args.backend}, {report['data']} data, {args.iterations} iterations, {args.workers} render workers")
+    print(f"{'Refresh':<13} {'Seconds':<9} {'New':<8} {'Revised':<8} {'Rows/s':<9} {'Requests':<9} {'Bytes':<10}")
+    print('-' * 70)
+    for result in refreshes:
+      print(f"{result['label']:<13} {result['seconds']:<9.2f} {result['points']['new']:<8} {result['points']['revised']:<8} "
+            f"{result['rows_per_second']:<9.0f} {sum(result['upstream_requests'].values()):<9} {result['upstream_bytes']:<10}")
+    print()
+    print(f"{'Range':<8} {'Query p50':<11} {'Query p95':<11} {'Cached p50':<11} {'Render p50':<11} {'Render p95':<11} (ms)")
+    print('-' * 70)
+    for time_range in app.TIME_RANGES:
+      query, render = queries[time_range], renders[time_range]
+      print(f"{time_range:<8} {query['cold']['p50_ms']:<11.1f} {query['cold']['p95_ms']:<11.1f} "
+            f"{query['cached']['p50_ms']:<11.3f} {render['p50_ms']:<11.1f} {render['p95_ms']:<11.1f}")
+
+
+# Render workers are spawned processes that re-import this module
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import db
+
+BENCH_INDICATOR = "__bench_upsert__"
+
+parser = argparse.ArgumentParser(
+    description="Compare the per-row INSERT loop with the bulk upsert path against the configured database.")
+parser.add_argument("--rows", type=int, default=5000, help="Number of daily observations to write.")
+parser.add_argument("--chunk-size", type=int, default=app.UPSERT_CHUNK_SIZE, help="Rows per multi-row INSERT.")
+args = parser.parse_args()
+
+
+def synthetic_frame(rows, seed):
+  dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=rows)
+  values = 4000 + np.random.default_rng(seed).normal(0, 10, rows).cumsum()
+  return pd.DataFrame({"value": values}, index=dates)
+
+
+def legacy_upsert(cursor, indicator_id, df):
+  # The original refresh_data() loop: one statement per observation
+  for date, row in df.iterrows():
+    cursor.execute(db.upsert_statement("historical_data", ("indicator_id", "date", "value"), ("indicator_id", "date")),
+                   (indicator_id, date.date(), row['value']))
+
+
+def bulk_upsert(cursor, indicator_id, df):
+  app.upsert_historical_data(cursor, indicator_id, df)
+
+
+def timed(conn, cursor, write, indicator_id, df):
+  started = time.perf_counter()
+  write(cursor, indicator_id, df)
+  conn.commit()
+  return time.perf_counter() - started
+
+
+def clear_rows(conn, cursor, indicator_id):
+  cursor.execute("DELETE FROM historical_data WHERE indicator_id = %s", (indicator_id,))
+  conn.commit()
+
+
+app.UPSERT_CHUNK_SIZE = args.chunk_size
+conn = db.get_connection()
+cursor = conn.cursor(dictionary=True)
+try:
+  cursor.execute(db.upsert_statement("indicators", ("name", "units"), ("name",)), (BENCH_INDICATOR, "Points"))
+  cursor.execute("SELECT id FROM indicators WHERE name = %s", (BENCH_INDICATOR,))
+  indicator_id = cursor.fetchone()['id']
+  conn.commit()
+
+  initial = synthetic_frame(args.rows, seed=1)
+  revised = synthetic_frame(args.rows, seed=2)
+
+  results = []
+  for label, write in (("per-row loop", legacy_upsert), ("bulk upsert", bulk_upsert)):
+    clear_rows(conn, cursor, indicator_id)
+    insert_time = timed(conn, cursor, write, indicator_id, initial)
+    update_time = timed(conn, cursor, write, indicator_id, revised)
+    results.append((label, insert_time, update_time))
+
+  print(f"{args.rows} rows, chunk size {args.chunk_size}")
+  print(f"{'Method':<15} {'Insert (s)':<12} {'Update (s)':<12} {'Rows/s (insert)':<16}")
+  print('-' * 55)
+  for label, insert_time, update_time in results:
+    print(f"{label:<15} {insert_time:<12.3f} {update_time:<12.3f} {args.rows / insert_time:<16.0f}")
+  print(f"Speedup: {results[0][1] / results[1][1]:.1f}x insert, {results[0][2] / results[1][2]:.1f}x update")
+finally:
+  cursor.execute("DELETE FROM historical_data WHERE indicator_id = (SELECT id FROM indicators WHERE name = %s)",
+                 (BENCH_INDICATOR,))
+  cursor.execute("DELETE FROM indicators WHERE name = %s", (BENCH_INDICATOR,))
+  conn.commit()
+  cursor.close()
+  conn.close()
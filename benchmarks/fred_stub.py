@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# Stand-in for the FRED API (series, series/observations and series/updates) and for
+# yfinance, serving recorded or synthetic data so refreshes can be measured
+# without network access or an API key. Point the app at it with
+# FRED_API_URL=http://127.0.0.1:<port>/fred.
+
+LAST_UPDATED = "2024-01-01 08:00:00-06"
+
+
+class FredStub:
+  def __init__(self, history, recordings=None, latency=0.0):
+    # history(series_id) -> DataFrame with a "value" column, used for series
+    # without a recording in `recordings` (a directory written by --record)
+    self.history = history
+    self.recordings = recordings
+    self.latency = latency
+    # series_id -> last_updated of series reported by series/updates, and by
+    # series in place of the default LAST_UPDATED
+    self.updated = {}
+    # Series whose observations requests are answered with a 503
+    self.failing = set()
+    self.lock = threading.Lock()
+    self.requests = {"series": 0, "observations": 0, "updates": 0, "yahoo": 0}
+    self.bytes_sent = 0
+    self.server = None
+
+  def recorded(self, series_id, endpoint):
+    if not self.recordings:
+      return None
+    path = os.path.join(self.recordings, series_id, f"{endpoint}.json")
+    if not os.path.exists(path):
+      return None
+    with open(path) as f:
+      return json.load(f)
+
+  def series(self, series_id):
+    recorded = self.recorded(series_id, "series")
+    if recorded is not None:
+      return recorded
+    return {"seriess": [{"id": series_id, "units": "Units", "last_updated": self.updated.get(series_id, LAST_UPDATED)}]}
+
+  def updates(self, offset=0, limit=1000):
+    # Every series in `updated`, whatever the requested time range
+    seriess = [{"id": series_id, "last_updated": last_updated} for series_id, last_updated in sorted(self.updated.items())]
+    return {"count": len(seriess), "offset": offset, "limit": limit, "seriess": seriess[offset:offset + limit]}
+
+  def observations(self, series_id, observation_start=None):
+    recorded = self.recorded(series_id, "observations")
+    if recorded is not None:
+      observations = recorded["observations"]
+    else:
+      df = self.history(series_id)
+      observations = [{"date": date.strftime("%Y-%m-%d"), "value": repr(value)}
+                      for date, value in zip(df.index, df["value"].tolist())]
+    if observation_start:
+      observations = [row for row in observations if row["date"] >= observation_start]
+    return {"observations": observations}
+
+  def count(self, endpoint, size):
+    with self.lock:
+      self.requests[endpoint] += 1
+      self.bytes_sent += size
+
+  def snapshot(self):
+    with self.lock:
+      return {"requests": dict(self.requests), "bytes_sent": self.bytes_sent}
+
+  def ticker(self, symbol):
+    # Replaces yf.Ticker: history() returns daily closes like yfinance does
+    stub = self
+
+    class Ticker:
+      def history(self, start=None, end=None):
+        if stub.latency:
+          time.sleep(stub.latency)
+        df = stub.history("SP500")
+        df = df[(df.index >= pd.Timestamp(start or df.index.min())) & (df.index < pd.Timestamp(end or df.index.max()))]
+        stub.count("yahoo", 0)
+        history = df.rename(columns={"value": "Close"})
+        history.index = history.index.tz_localize("America/New_York")
+        return history
+
+    return Ticker()
+
+  def start(self, host="127.0.0.1", port=0):
+    stub = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def log_message(self, *args):
+        pass
+
+      def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if stub.latency:
+          time.sleep(stub.latency)
+        if url.path == "/fred/series/observations" and params.get("series_id") in stub.failing:
+          stub.count("observations", 0)
+          self.send_error(503)
+          return
+        if url.path == "/fred/series/observations":
+          endpoint, body = "observations", stub.observations(params.get("series_id"), params.get("observation_start"))
+        elif url.path == "/fred/series/updates":
+          endpoint, body = "updates", stub.updates(int(params.get("offset", 0)), int(params.get("limit", 1000)))
+        elif url.path == "/fred/series":
+          endpoint, body = "series", stub.series(params.get("series_id"))
+        else:
+          self.send_error(404)
+          return
+        data = json.dumps(body).encode()
+        stub.count(endpoint, len(data))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    self.server = ThreadingHTTPServer((host, port), Handler)
+    self.server.daemon_threads = True
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    return f"http://{host}:{self.server.server_port}/fred"
+
+  def stop(self):
+    if self.server:
+      self.server.shutdown()
+      self.server.server_close()
+
+
+def record(directory, series_ids, api_key, api_url="https://api.stlouisfed.org/fred"):
+  # Saves live FRED responses so later benchmark runs replay real data
+  import requests
+  for series_id in series_ids:
+    os.makedirs(os.path.join(directory, series_id), exist_ok=True)
+    for endpoint, path in (("series", "series"), ("observations", "series/observations")):
+      response = requests.get(f"{api_url}/{path}", params={"series_id": series_id, "api_key": api_key, "file_type": "json"},
+                              timeout=30)
+      response.raise_for_status()
+      with open(os.path.join(directory, series_id, f"{endpoint}.json"), "w") as f:
+        f.write(response.text)
+    print(f"Recorded {series_id}.")
+    time.sleep(0.5)
+
+
+if __name__ == '__main__':
+  sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+  import app
+  import synthetic
+
+  parser = argparse.ArgumentParser(description="Serve synthetic or recorded FRED responses, or record live ones.")
+  parser.add_argument("--port", type=int, default=8099)
+  parser.add_argument("--recordings", help="Directory of recorded responses to replay.")
+  parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+  parser.add_argument("--record", metavar="DIR", help="Record live responses for all indicators into DIR (needs FRED_API_KEY).")
+  args = parser.parse_args()
+
+  if args.record:
+    record(args.record, app.INDICATORS.values(), app.FRED_API_KEY)
+  else:
+    stub = FredStub(synthetic.synthetic_history, args.recordings, args.latency)
+    stub.start("0.0.0.0", args.port)
+    print(f"Serving FRED stand-in, run the app with FRED_API_URL=http://127.0.0.1:{args.port}/fred")
+    try:
+      threading.Event().wait()
+    except KeyboardInterrupt:
+      stub.stop()
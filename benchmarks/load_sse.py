@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+parser = argparse.ArgumentParser(
+    description="Open increasing numbers of /subscribe streams against a running server and measure request latency.")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=5001)
+parser.add_argument("--path", default="/api/series?time_range=5y", help="Request timed at every subscriber level.")
+parser.add_argument("--levels", default="0,50,100,200,500,1000,2000",
+                    help="Comma-separated numbers of concurrent subscribers.")
+parser.add_argument("--requests", type=int, default=50, help="Timed requests per level.")
+parser.add_argument("--concurrency", type=int, default=5, help="Timed requests in flight at once.")
+parser.add_argument("--max-p95-ms", type=float, default=500, help="Stop once p95 latency exceeds this.")
+parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+args = parser.parse_args()
+
+
+async def open_subscriber():
+  reader, writer = await asyncio.open_connection(args.host, args.port)
+  writer.write(f"GET /subscribe HTTP/1.1\r\nHost: {args.host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+  await writer.drain()
+  status = await reader.readline()
+  if b" 200 " not in status:
+    raise ConnectionError(f"Subscribe failed: {status!r}")
+  return reader, writer
+
+
+async def drain(reader):
+  # Keep reading heartbeats and events so the server never blocks on us
+  while await reader.read(4096):
+    pass
+
+
+async def timed_request():
+  started = time.perf_counter()
+  reader, writer = await asyncio.open_connection(args.host, args.port)
+  writer.write(f"GET {args.path} HTTP/1.1\r\nHost: {args.host}\r\nConnection: close\r\n\r\n".encode())
+  await writer.drain()
+  status = await reader.readline()
+  await reader.read()
+  writer.close()
+  if b" 200 " not in status and b" 304 " not in status:
+    raise ConnectionError(f"Request failed: {status!r}")
+  return time.perf_counter() - started
+
+
+async def measure():
+  semaphore = asyncio.Semaphore(args.concurrency)
+
+  async def one():
+    async with semaphore:
+      return await timed_request()
+
+  results = await asyncio.gather(*(one() for _ in range(args.requests)), return_exceptions=True)
+  latencies = [r for r in results if not isinstance(r, BaseException)]
+  return latencies, len(results) - len(latencies)
+
+
+async def main():
+  subscribers = []
+  drains = []
+  report = []
+  for level in [int(level) for level in args.levels.split(",")]:
+    failed_subscribers = 0
+    while len(subscribers) + failed_subscribers < level:
+      try:
+        reader, writer = await asyncio.wait_for(open_subscriber(), timeout=10)
+      except (OSError, asyncio.TimeoutError, ConnectionError):
+        failed_subscribers += 1
+        continue
+      subscribers.append(writer)
+      drains.append(asyncio.ensure_future(drain(reader)))
+
+    latencies, errors = await measure()
+    result = {
+        "subscribers": len(subscribers),
+        "failed_subscribers": failed_subscribers,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        "p95_ms": float(np.percentile(latencies, 95) * 1000) if latencies else None,
+        "errors": errors,
+    }
+    report.append(result)
+    if not args.json:
+      p50 = f"{result['p50_ms']:.1f}" if latencies else "-"
+      p95 = f"{result['p95_ms']:.1f}" if latencies else "-"
+      print(f"{result['subscribers']:<12} {p50:<10} {p95:<10} {errors:<8} {failed_subscribers:<8}", flush=True)
+    if not latencies or result["p95_ms"] > args.max_p95_ms or failed_subscribers:
+      break
+
+  for task in drains:
+    task.cancel()
+  for writer in subscribers:
+    writer.close()
+  return report
+
+
+if not args.json:
+  print(f"Timing {args.requests} x GET {args.path} per level, p95 limit {args.max_p95_ms} ms")
+  print(f"{'Subscribers':<12} {'p50 (ms)':<10} {'p95 (ms)':<10} {'Errors':<8} {'Refused':<8}")
+  print('-' * 50)
+report = asyncio.run(main())
+if args.json:
+  print(json.dumps(report, indent=2))
@@ -0,0 +1,95 @@
+import argparse
+import gc
+import json
+import os
+import re
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import synthetic
+
+parser = argparse.ArgumentParser(
+    description="Hit the dashboard repeatedly per time range against a synthetic dataset and report memory and latency.")
+parser.add_argument("--iterations", type=int, default=20, help="Requests per time range.")
+parser.add_argument("--workers", type=int, default=0,
+                    help="RENDER_WORKERS to use (default 0, so rendering happens in this process and shows up in RSS).")
+parser.add_argument("--warm", action="store_true", help="Keep the tile cache between requests instead of rendering every time.")
+parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+args = parser.parse_args()
+
+
+def rss_bytes():
+  try:
+    with open("/proc/self/status") as f:
+      for line in f:
+        if line.startswith("VmRSS:"):
+          return int(line.split()[1]) * 1024
+  except OSError:
+    pass
+  # Peak RSS, in kilobytes on Linux and bytes on macOS
+  maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def fetch_dashboard(client, time_range):
+  page = client.get(f"/?time_range={time_range}")
+  size = len(page.data)
+  for src in re.findall(r'src="([^"]+)"', page.get_data(as_text=True)):
+    size += len(client.get(src.replace("&amp;", "&")).data)
+  return size
+
+
+app.RENDER_WORKERS = args.workers
+app.read_series = synthetic.make_read_series(synthetic.synthetic_dataset())
+client = app.app.test_client()
+
+# One untimed pass so imports, font caches and the worker pool are set up
+for time_range in app.TIME_RANGES:
+  fetch_dashboard(client, time_range)
+gc.collect()
+rss_start = rss_bytes()
+
+results = {}
+for time_range in app.TIME_RANGES:
+  latencies = []
+  sizes = []
+  for _ in range(args.iterations):
+    if not args.warm:
+      app.tile_cache.clear()
+      app.invalidate_data_cache()
+    started = time.perf_counter()
+    sizes.append(fetch_dashboard(client, time_range))
+    latencies.append(time.perf_counter() - started)
+  results[time_range] = {
+      "p50_ms": float(np.percentile(latencies, 50) * 1000),
+      "p95_ms": float(np.percentile(latencies, 95) * 1000),
+      "bytes_per_response": int(np.mean(sizes)),
+  }
+
+gc.collect()
+rss_end = rss_bytes()
+report = {
+    "iterations": args.iterations,
+    "workers": args.workers,
+    "warm": args.warm,
+    "rss_start_bytes": rss_start,
+    "rss_end_bytes": rss_end,
+    "rss_growth_bytes": rss_end - rss_start,
+    "time_ranges": results,
+}
+
+if args.json:
+  print(json.dumps(report, indent=2))
+else:
+  print(f"{args.iterations} requests per time range, {args.workers} render workers, {'warm' if args.warm else 'cold'} cache")
+  print(f"{'Range':<8} {'p50 (ms)':<10} {'p95 (ms)':<10} {'Bytes/response':<15}")
+  print('-' * 45)
+  for time_range, result in results.items():
+    print(f"{time_range:<8} {result['p50_ms']:<10.1f} {result['p95_ms']:<10.1f} {result['bytes_per_response']:<15}")
+  print(f"RSS: {rss_start / 2**20:.1f} MiB -> {rss_end / 2**20:.1f} MiB ({(rss_end - rss_start) / 2**20:+.1f} MiB)")
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+# Native frequency of every series in app.INDICATORS, as a pandas offset alias
+SERIES_FREQUENCIES = {
+    "GDP": "QS",
+    "UNRATE": "MS",
+    "PCE": "MS",
+    "FEDFUNDS": "MS",
+    "SP500": "B",
+    "BOPGSTB": "MS",
+    "DGS2": "B",
+    "DGS10": "B",
+    "DGS20": "B",
+    "M2SL": "MS",
+    "CP": "QS",
+    "UMCSENT": "MS",
+    "IC4WSA": "W-SAT",
+    "RSXFS": "MS",
+    "INDPRO": "MS",
+    "HOUST": "MS",
+    "NAPM": "MS",
+    "PPIACO": "MS",
+    "MMMFFAQ027S": "QS",
+}
+
+
+def synthetic_history(series_id, end=None, days=app.BACKFILL_DAYS):
+  end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+  dates = pd.date_range(end=end, start=end - pd.Timedelta(days=days), freq=SERIES_FREQUENCIES.get(series_id, "MS"))
+  rng = np.random.default_rng(sum(series_id.encode()))
+  values = 100 + rng.normal(0, 1, len(dates)).cumsum()
+  return pd.DataFrame({"value": values.round(4)}, index=dates)
+
+
+def synthetic_dataset():
+  dataset = {name: (synthetic_history(series_id), "Units")
+             for name, series_id in app.INDICATORS.items()}
+  # Derived indicators are stored next to the fetched ones
+  for name, derived in app.DERIVED_INDICATORS.items():
+    sources = {source: dataset[source][0]["value"] for source in derived["sources"]}
+    dataset[name] = (derived["compute"](sources).dropna().to_frame("value"), derived["units"])
+  return dataset
+
+
+def make_read_series(dataset):
+  # Stand-in for app.read_series() that slices the synthetic dataset instead
+  # of querying the database
+  def read_series(start_date):
+    start_date = pd.Timestamp(start_date)
+    data_frames = {name: df[df.index >= start_date] for name, (df, units) in dataset.items()}
+    indicator_units = {name: units for name, (df, units) in dataset.items()}
+    return data_frames, indicator_units
+  return read_series
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from io import BytesIO
+import time
+
+import matplotlib
+from matplotlib.figure import Figure
+
+matplotlib.use('Agg')
+
+# One cell of the former two-column dashboard figure
+TILE_SIZE = (8, 4)
+TILE_DPI = 100
+
+
+@contextmanager
+def tile_figure():
+  # Uses the object-oriented Figure API only, so nothing is registered with
+  # pyplot and tiles can be drawn concurrently in worker processes
+  fig = Figure(figsize=TILE_SIZE, dpi=TILE_DPI)
+  try:
+    yield fig
+  finally:
+    # Drop axes and artists right away instead of leaving the reference
+    # cycles to the garbage collector
+    fig.clear()
+
+
+def render_tile(name, df, units):
+  return render_tile_timed(name, df, units)[0]
+
+
+def render_tile_timed(name, df, units):
+  # Returns the PNG and the seconds spent in each phase. Tiles usually render
+  # in worker processes, so the timings travel back with the result.
+  phases = {}
+  with tile_figure() as fig:
+    started = time.perf_counter()
+    ax = fig.subplots()
+    if list(df.columns) == ["value"]:
+      ax.plot(df.index, df["value"], label=name, linewidth=1)
+    else:
+      # Columns are sampled independently, so skip the gaps of the combined index
+      for col in df.columns:
+        series = df[col].dropna()
+        ax.plot(series.index, series, label=col, linewidth=1)
+    ax.set_ylabel(units or "Value")
+    ax.legend()
+    ax.grid(True)
+    phases["plot"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fig.tight_layout()
+    phases["tight_layout"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with BytesIO() as buf:
+      fig.savefig(buf, format="png")
+      png = buf.getvalue()
+    phases["savefig"] = time.perf_counter() - started
+  return png, phases
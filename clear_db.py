@@ -1,29 +1,15 @@
-import mysql.connector
-import os
 import argparse
-from dotenv import load_dotenv
+
+import db
 
 # Set up argument parser
 parser = argparse.ArgumentParser(description="Clear entries from the economic_data table.")
 parser.add_argument("--indicator", help="The name of the indicator to delete.")
 args = parser.parse_args()
 
-# Load environment variables
-load_dotenv()
-
-DB_HOST = os.environ.get('MYSQL_HOST')
-DB_USER = os.environ.get('MYSQL_USER')
-DB_PASSWORD = os.environ.get('MYSQL_PASSWORD')
-DB_NAME = os.environ.get('MYSQL_DB')
-
 try:
     # Establish database connection
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+    conn = db.get_connection()
     cursor = conn.cursor()
 
     if args.indicator:
@@ -33,8 +19,10 @@ try:
 
         if indicator_id:
             indicator_id = indicator_id[0]
-            # Delete entries for a specific indicator from historical_data
+            # Delete entries for a specific indicator from historical_data and its rollups
             cursor.execute("DELETE FROM historical_data WHERE indicator_id = %s", (indicator_id,))
+            cursor.execute("DELETE FROM historical_data_weekly WHERE indicator_id = %s", (indicator_id,))
+            cursor.execute("DELETE FROM historical_data_monthly WHERE indicator_id = %s", (indicator_id,))
             # Delete the indicator from the indicators table
             cursor.execute("DELETE FROM indicators WHERE id = %s", (indicator_id,))
             conn.commit()
@@ -42,17 +30,19 @@ try:
         else:
             print(f"Indicator '{args.indicator}' not found.")
     else:
-        # Truncate both tables (order matters due to foreign key constraint)
-        cursor.execute("TRUNCATE TABLE historical_data")
-        cursor.execute("TRUNCATE TABLE indicators")
+        # Empty all tables (order matters due to foreign key constraint)
+        cursor.execute("DELETE FROM historical_data")
+        cursor.execute("DELETE FROM historical_data_weekly")
+        cursor.execute("DELETE FROM historical_data_monthly")
+        cursor.execute("DELETE FROM indicators")
         conn.commit()
-        print("Tables 'historical_data' and 'indicators' have been successfully emptied.")
+        print("Tables 'historical_data', its rollups and 'indicators' have been successfully emptied.")
 
     # Clean up
     cursor.close()
     conn.close()
 
-except mysql.connector.Error as err:
+except db.Error as err:
     print(f"Database Error: {err}")
 except Exception as e:
     print(f"An error occurred: {e}")
@@ -0,0 +1,313 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "mysql", or "sqlite" for single-node deployments without a database server
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mysql").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "economic_indicators.db")
+
+# Database Configuration
+DB_HOST = os.environ.get("MYSQL_HOST")
+DB_USER = os.environ.get("MYSQL_USER")
+DB_PASSWORD = os.environ.get("MYSQL_PASSWORD")
+DB_NAME = os.environ.get("MYSQL_DB")
+
+# Connections kept open and shared by the web app, the scheduler and the CLI tools
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+# Idle connections older than this are pinged before they are handed out again
+DB_POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", 30))
+# Statements slower than this are logged
+DB_SLOW_QUERY_SECONDS = float(os.environ.get("DB_SLOW_QUERY_SECONDS", 1.0))
+
+Error = (mysql.connector.Error, sqlite3.Error)
+
+if STORAGE_BACKEND == "sqlite":
+  ID_COLUMN = "INTEGER PRIMARY KEY AUTOINCREMENT"
+  TIMESTAMP_COLUMN = "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+else:
+  ID_COLUMN = "INT AUTO_INCREMENT PRIMARY KEY"
+  TIMESTAMP_COLUMN = "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+
+# Store dates as ISO strings and read DATE/TIMESTAMP columns back as date/datetime, like mysql.connector
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+
+def connect():
+  if STORAGE_BACKEND == "sqlite":
+    return SqliteConnection(SQLITE_PATH)
+  return mysql.connector.connect(
+      host=DB_HOST,
+      user=DB_USER,
+      password=DB_PASSWORD,
+      database=DB_NAME
+  )
+
+
+def upsert_statement(table, columns, keys, extra_updates=()):
+  # INSERT that overwrites the non-key columns when a row with the same keys exists
+  placeholders = ", ".join(["%s"] * len(columns))
+  statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+  updated = [column for column in columns if column not in keys]
+  if STORAGE_BACKEND == "sqlite":
+    assignments = [f"{column} = excluded.{column}" for column in updated] + list(extra_updates)
+    return f"{statement} ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(assignments)}"
+  assignments = [f"{column} = VALUES({column})" for column in updated] + list(extra_updates)
+  return f"{statement} ON DUPLICATE KEY UPDATE {', '.join(assignments)}"
+
+
+def column_exists(cursor, table, column):
+  if STORAGE_BACKEND == "sqlite":
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+  cursor.execute(
+      "SELECT COUNT(*) FROM information_schema.columns WHERE table_schema = %s AND table_name = %s AND column_name = %s",
+      (DB_NAME, table, column))
+  return cursor.fetchone()[0] > 0
+
+
+class SqliteConnection:
+  # The subset of the mysql.connector connection API the app and scripts use
+
+  def __init__(self, path):
+    # Pooled connections move between threads, but only one uses a connection at a time
+    self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    # WAL lets page views read while the refresh job writes
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.execute("PRAGMA busy_timeout=5000")
+    self._conn.execute("PRAGMA foreign_keys=ON")
+
+  @property
+  def in_transaction(self):
+    return self._conn.in_transaction
+
+  def cursor(self, dictionary=False):
+    cursor = self._conn.cursor()
+    if dictionary:
+      cursor.row_factory = lambda cur, row: {col[0]: value for col, value in zip(cur.description, row)}
+    return SqliteCursor(cursor)
+
+  def commit(self):
+    self._conn.commit()
+
+  def rollback(self):
+    self._conn.rollback()
+
+  def ping(self, reconnect=False):
+    self._conn.execute("SELECT 1")
+
+  def close(self):
+    self._conn.close()
+
+
+class SqliteCursor:
+  # Accepts the %s placeholders written for mysql.connector
+
+  def __init__(self, cursor):
+    self._cursor = cursor
+
+  def execute(self, operation, params=None):
+    return self._cursor.execute(operation.replace("%s", "?"), params or ())
+
+  def executemany(self, operation, seq_params):
+    return self._cursor.executemany(operation.replace("%s", "?"), seq_params)
+
+  def __getattr__(self, name):
+    return getattr(self._cursor, name)
+
+  def __iter__(self):
+    return iter(self._cursor)
+
+
+class ConnectionPool:
+  def __init__(self, factory, size, timeout):
+    self.factory = factory
+    self.size = size
+    self.timeout = timeout
+    self.idle = queue.LifoQueue()
+    self.slots = threading.BoundedSemaphore(size)
+    self.lock = threading.Lock()
+    self.stats = {
+        "checkouts": 0,
+        "waits": 0,
+        "wait_seconds": 0.0,
+        "timeouts": 0,
+        "created": 0,
+        "discarded": 0,
+        "in_use": 0,
+        "max_in_use": 0,
+    }
+    # Statement kind (SELECT, INSERT, ...) -> [count, total seconds]
+    self.queries = {}
+
+  def get_connection(self):
+    started = time.perf_counter()
+    if not self.slots.acquire(blocking=False):
+      # Every connection is checked out, wait for one to come back
+      if not self.slots.acquire(timeout=self.timeout):
+        with self.lock:
+          self.stats["timeouts"] += 1
+        raise PoolError(f"No database connection available after {self.timeout}s (pool size {self.size})")
+      waited = time.perf_counter() - started
+      logging.warning(f"Waited {waited:.3f}s for a database connection (pool size {self.size}).")
+      with self.lock:
+        self.stats["waits"] += 1
+        self.stats["wait_seconds"] += waited
+    try:
+      conn = self.checkout()
+    except Exception:
+      self.slots.release()
+      raise
+    with self.lock:
+      self.stats["checkouts"] += 1
+      self.stats["in_use"] += 1
+      self.stats["max_in_use"] = max(self.stats["max_in_use"], self.stats["in_use"])
+    return PooledConnection(self, conn)
+
+  def checkout(self):
+    while True:
+      try:
+        conn, returned_at = self.idle.get_nowait()
+      except queue.Empty:
+        conn = self.factory()
+        with self.lock:
+          self.stats["created"] += 1
+        return conn
+      if time.monotonic() - returned_at < DB_POOL_PING_AFTER or self.is_healthy(conn):
+        return conn
+      self.discard(conn)
+
+  def is_healthy(self, conn):
+    try:
+      conn.ping(reconnect=False)
+      return True
+    except Error:
+      return False
+
+  def discard(self, conn):
+    with self.lock:
+      self.stats["discarded"] += 1
+    try:
+      conn.close()
+    except Error:
+      pass
+
+  def release(self, conn):
+    try:
+      # Never hand out a connection with a transaction left open
+      if conn.in_transaction:
+        conn.rollback()
+      self.idle.put((conn, time.monotonic()))
+    except Error:
+      self.discard(conn)
+    finally:
+      with self.lock:
+        self.stats["in_use"] -= 1
+      self.slots.release()
+
+  def record_query(self, statement, seconds):
+    match = re.match(r'\s*(\w+)', statement)
+    kind = match.group(1).upper() if match else "OTHER"
+    with self.lock:
+      entry = self.queries.setdefault(kind, [0, 0.0])
+      entry[0] += 1
+      entry[1] += seconds
+    if seconds >= DB_SLOW_QUERY_SECONDS:
+      logging.warning(f"Slow query ({seconds:.2f}s): {statement[:200]}")
+
+  def snapshot(self):
+    with self.lock:
+      stats = dict(self.stats)
+      stats["size"] = self.size
+      stats["idle"] = self.idle.qsize()
+      stats["queries"] = {kind: {"count": count, "seconds": seconds} for kind, (count, seconds) in self.queries.items()}
+    return stats
+
+
+class PooledConnection:
+  # Behaves like a mysql.connector connection; close() hands it back to the pool
+
+  def __init__(self, pool, conn):
+    self._pool = pool
+    self._conn = conn
+
+  def cursor(self, *args, **kwargs):
+    return TimedCursor(self._pool, self._conn.cursor(*args, **kwargs))
+
+  def close(self):
+    if self._conn is not None:
+      self._pool.release(self._conn)
+      self._conn = None
+
+  def __getattr__(self, name):
+    return getattr(self._conn, name)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+class TimedCursor:
+  # Records the time of every statement in the pool's query stats
+
+  def __init__(self, pool, cursor):
+    self._pool = pool
+    self._cursor = cursor
+
+  def execute(self, operation, params=None):
+    started = time.perf_counter()
+    try:
+      return self._cursor.execute(operation, params)
+    finally:
+      self._pool.record_query(operation, time.perf_counter() - started)
+
+  def executemany(self, operation, seq_params):
+    started = time.perf_counter()
+    try:
+      return self._cursor.executemany(operation, seq_params)
+    finally:
+      self._pool.record_query(operation, time.perf_counter() - started)
+
+  def __getattr__(self, name):
+    return getattr(self._cursor, name)
+
+  def __iter__(self):
+    return iter(self._cursor)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+  global _pool
+  with _pool_lock:
+    if _pool is None:
+      _pool = ConnectionPool(connect, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+  return _pool
+
+
+def get_connection():
+  return get_pool().get_connection()
+
+
+def pool_stats():
+  return get_pool().snapshot()
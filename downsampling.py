@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+  # Largest-triangle-three-buckets: keeps the first and last point and, per
+  # bucket, the point forming the largest triangle with the previously kept
+  # point and the average of the next bucket
+  n = len(x)
+  if n_out >= n or n_out < 3:
+    return np.arange(n)
+  edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+  selected = np.empty(n_out, dtype=np.int64)
+  selected[0] = 0
+  selected[-1] = n - 1
+  a = 0
+  for i in range(n_out - 2):
+    start, end = edges[i], edges[i + 1]
+    next_start, next_end = (edges[i + 1], edges[i + 2]) if i < n_out - 3 else (n - 1, n)
+    avg_x = x[next_start:next_end].mean()
+    avg_y = y[next_start:next_end].mean()
+    area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+    a = start + int(np.argmax(area))
+    selected[i + 1] = a
+  return selected
+
+
+def minmax_indices(y, n_out):
+  # Keeps the minimum and maximum of each of n_out / 2 equal-count buckets
+  n = len(y)
+  if n_out >= n or n_out < 2:
+    return np.arange(n)
+  buckets = np.arange(n) * (n_out // 2) // n
+  order = np.lexsort((y, buckets))
+  first = np.r_[True, buckets[order][1:] != buckets[order][:-1]]
+  last = np.r_[buckets[order][1:] != buckets[order][:-1], True]
+  return np.unique(np.concatenate(([0, n - 1], order[first], order[last])))
+
+
+def downsample(df, n_out, method="lttb"):
+  series = df["value"].dropna()
+  if len(series) <= n_out:
+    return df
+  y = series.to_numpy(dtype=float)
+  if method == "minmax":
+    indices = minmax_indices(y, n_out)
+  else:
+    x = series.index.asi8.astype(float)
+    indices = lttb_indices(x, y, n_out)
+  return pd.DataFrame({"value": y[indices]}, index=series.index[indices])
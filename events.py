@@ -0,0 +1,116 @@
+import asyncio
+import collections
+import threading
+
+
+class EventHub:
+  # Broadcasts server-sent events to any number of subscribers. Every
+  # subscriber keeps its own cursor into a bounded history, so nobody can
+  # consume an event before the others have seen it, and a reconnecting
+  # client resumes from its Last-Event-ID.
+
+  def __init__(self, epoch, history=256):
+    # Event ids look like "<epoch>-<sequence>", so ids from an earlier
+    # process are recognized as stale after a restart
+    self.epoch = str(epoch)
+    self.condition = threading.Condition()
+    self.events = collections.deque(maxlen=history)
+    self.sequence = 0
+    # (event loop, asyncio.Event) of subscribers waiting in astream()
+    self.async_waiters = set()
+
+  def publish(self, event, data):
+    with self.condition:
+      self.sequence += 1
+      self.events.append((self.sequence, event, data))
+      self.condition.notify_all()
+      for loop, wakeup in list(self.async_waiters):
+        try:
+          loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+          # The subscriber's event loop is already closed
+          self.async_waiters.discard((loop, wakeup))
+      return self.sequence
+
+  def format(self, sequence, event, data):
+    return f"id: {self.epoch}-{sequence}\nevent: {event}\ndata: {data}\n\n"
+
+  def resume_cursor(self, last_event_id):
+    # Returns the cursor to continue from and whether the client missed
+    # events that are no longer in the history
+    with self.condition:
+      if not last_event_id:
+        return self.sequence, False
+      epoch, _, sequence = last_event_id.rpartition("-")
+      if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self.sequence:
+        return self.sequence, True
+      return int(sequence), self.missed(int(sequence))
+
+  def missed(self, cursor):
+    oldest = self.events[0][0] if self.events else self.sequence + 1
+    return cursor + 1 < oldest
+
+  def pending(self, cursor):
+    return [event for event in self.events if event[0] > cursor]
+
+  def take(self, cursor):
+    # Called with the condition held
+    missed = self.missed(cursor)
+    return missed, [] if missed else self.pending(cursor)
+
+  def stream(self, last_event_id=None, heartbeat=15):
+    cursor, missed = self.resume_cursor(last_event_id)
+    yield "retry: 5000\n\n"
+    while True:
+      if missed:
+        # Too far behind to replay, make the client reload everything
+        with self.condition:
+          cursor = self.sequence
+        yield self.format(cursor, "refresh", "{}")
+      with self.condition:
+        if not self.pending(cursor):
+          self.condition.wait(heartbeat)
+        missed, events = self.take(cursor)
+      if events:
+        for sequence, event, data in events:
+          yield self.format(sequence, event, data)
+        cursor = events[-1][0]
+      elif not missed:
+        yield ": heartbeat\n\n"
+
+  async def astream(self, last_event_id=None, heartbeat=15):
+    # Same protocol as stream(), for event loop servers: an idle subscriber is
+    # a suspended coroutine instead of a blocked thread
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    waiter = (loop, wakeup)
+    with self.condition:
+      self.async_waiters.add(waiter)
+    try:
+      cursor, missed = self.resume_cursor(last_event_id)
+      yield "retry: 5000\n\n"
+      while True:
+        if missed:
+          with self.condition:
+            cursor = self.sequence
+          yield self.format(cursor, "refresh", "{}")
+        with self.condition:
+          idle = not self.pending(cursor)
+          if idle:
+            wakeup.clear()
+        if idle:
+          try:
+            await asyncio.wait_for(wakeup.wait(), heartbeat)
+          except asyncio.TimeoutError:
+            pass
+        with self.condition:
+          missed, events = self.take(cursor)
+        if events:
+          for sequence, event, data in events:
+            yield self.format(sequence, event, data)
+          cursor = events[-1][0]
+        elif not missed:
+          yield ": heartbeat\n\n"
+    finally:
+      with self.condition:
+        self.async_waiters.discard(waiter)
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Status codes worth retrying: rate limiting and upstream trouble
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Query parameters left out of cache keys and cache files
+SECRET_PARAMS = {"api_key"}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+  pass
+
+
+class RetryableError(requests.exceptions.HTTPError):
+  def __init__(self, status, retry_after=None):
+    super().__init__(f"HTTP {status}")
+    try:
+      self.retry_after = float(retry_after) if retry_after is not None else None
+    except ValueError:
+      # HTTP dates are not worth parsing here, fall back to the backoff schedule
+      self.retry_after = None
+
+
+class ResponseCache:
+  # One JSON file per request under `directory`, so cached responses
+  # survive restarts. Files are replaced atomically and never locked.
+
+  def __init__(self, directory):
+    self.directory = directory
+
+  def key(self, url, params=None):
+    public = {name: value for name, value in (params or {}).items() if name not in SECRET_PARAMS}
+    return hashlib.sha256(json.dumps([url, public], sort_keys=True, default=str).encode()).hexdigest()
+
+  def path(self, key):
+    return os.path.join(self.directory, key[:2], key + ".json")
+
+  def get(self, key):
+    try:
+      with open(self.path(key)) as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return None
+
+  def put(self, key, entry):
+    path = self.path(key)
+    try:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+      with os.fdopen(fd, "w") as f:
+        json.dump(entry, f)
+      os.replace(tmp_path, path)
+    except OSError as e:
+      logging.warning(f"Could not write response cache entry {path}: {e}")
+
+  def prune(self, max_age):
+    # Removes entries written more than `max_age` seconds ago. Requests whose
+    # parameters include the current date get a new key every day, so old
+    # entries would otherwise pile up.
+    cutoff = time.time() - max_age
+    removed = 0
+    for root, dirs, files in os.walk(self.directory):
+      for name in files:
+        path = os.path.join(root, name)
+        try:
+          if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+        except OSError:
+          # Replaced or removed concurrently
+          pass
+    return removed
+
+
+class CircuitBreaker:
+  # Stops calling a host after `threshold` consecutive failed requests and
+  # lets one request through again every `reset_after` seconds
+
+  def __init__(self, threshold, reset_after):
+    self.threshold = threshold
+    self.reset_after = reset_after
+    self.lock = threading.Lock()
+    self.failures = 0
+    self.open_until = 0.0
+
+  def allow(self):
+    with self.lock:
+      if self.failures < self.threshold:
+        return True
+      now = time.monotonic()
+      if now < self.open_until:
+        return False
+      # Half open: this caller probes the host, the others keep failing fast
+      self.open_until = now + self.reset_after
+      return True
+
+  def record_success(self):
+    with self.lock:
+      self.failures = 0
+
+  def record_failure(self):
+    with self.lock:
+      self.failures += 1
+      if self.failures >= self.threshold:
+        self.open_until = time.monotonic() + self.reset_after
+
+
+class CachedClient:
+  # Fetches upstream data through the response cache. Fresh entries are
+  # served without a request, stale ones are revalidated with conditional
+  # headers, failed requests are retried with jittered exponential backoff,
+  # and a stale entry is served when the host is down or its circuit is open,
+  # unless the caller passes allow_stale=False because it has to know that
+  # the response came from upstream.
+
+  def __init__(self, cache, session, rate_limiter, timeout, retries, backoff, backoff_max,
+               breaker_threshold, breaker_reset, observer=None):
+    self.cache = cache
+    self.session = session
+    self.rate_limiter = rate_limiter
+    self.timeout = timeout
+    self.retries = retries
+    self.backoff = backoff
+    self.backoff_max = backoff_max
+    self.breaker_threshold = breaker_threshold
+    self.breaker_reset = breaker_reset
+    # Called with (url, params, status, seconds, bytes) after every HTTP response
+    self.observer = observer
+    self.breakers = {}
+    self.lock = threading.Lock()
+    self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stale": 0, "retries": 0, "failures": 0}
+
+  def breaker(self, host):
+    with self.lock:
+      if host not in self.breakers:
+        self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+      return self.breakers[host]
+
+  def count(self, stat):
+    with self.lock:
+      self.stats[stat] += 1
+
+  def get_json(self, url, params, ttl, allow_stale=True):
+    key = self.cache.key(url, params)
+    entry = self.cache.get(key)
+    if entry is not None and time.time() - entry["stored_at"] < ttl:
+      self.count("hits")
+      return entry["body"]
+
+    def request():
+      headers = {}
+      if entry is not None:
+        if entry.get("etag"):
+          headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+          headers["If-Modified-Since"] = entry["last_modified"]
+      started = time.perf_counter()
+      response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+      if self.observer:
+        self.observer(url, params, response.status_code, time.perf_counter() - started, len(response.content))
+      if response.status_code == 304 and entry is not None:
+        self.count("revalidated")
+        return dict(entry, stored_at=time.time())
+      if response.status_code in RETRY_STATUSES:
+        raise RetryableError(response.status_code, response.headers.get("Retry-After"))
+      response.raise_for_status()
+      self.count("misses")
+      return {"stored_at": time.time(), "etag": response.headers.get("ETag"),
+              "last_modified": response.headers.get("Last-Modified"), "body": response.json()}
+
+    return self.fetch(urlparse(url).netloc, key, entry, request, allow_stale)["body"]
+
+  def call(self, host, key, ttl, load):
+    # Caches the JSON-serializable result of `load()` for sources without an
+    # HTTP API of their own, such as yfinance
+    key = self.cache.key(host, key)
+    entry = self.cache.get(key)
+    if entry is not None and time.time() - entry["stored_at"] < ttl:
+      self.count("hits")
+      return entry["body"]
+
+    def request():
+      body = load()
+      self.count("misses")
+      return {"stored_at": time.time(), "body": body}
+
+    return self.fetch(host, key, entry, request)["body"]
+
+  def fetch(self, host, key, entry, request, allow_stale=True):
+    # `entry` is still sent for revalidation, a 304 confirms it is current
+    fallback = entry if allow_stale else None
+    breaker = self.breaker(host)
+    if not breaker.allow():
+      return self.fall_back(fallback, CircuitOpenError(f"Circuit open for {host}, not sending request"))
+
+    error = None
+    for attempt in range(self.retries + 1):
+      if attempt:
+        self.count("retries")
+        time.sleep(self.retry_delay(attempt, error))
+      self.rate_limiter.wait(host)
+      try:
+        fresh = request()
+      except RetryableError as e:
+        error = e
+      except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        error = e
+      except requests.exceptions.RequestException:
+        # Anything else (4xx) will not go away by asking again, and the host is up
+        breaker.record_success()
+        raise
+      except Exception as e:
+        # Non-HTTP loaders raise whatever their library raises
+        error = e
+      else:
+        breaker.record_success()
+        self.cache.put(key, fresh)
+        return fresh
+      logging.warning(f"Request to {host} failed (attempt {attempt + 1} of {self.retries + 1}): {error}")
+
+    breaker.record_failure()
+    self.count("failures")
+    return self.fall_back(fallback, error)
+
+  def retry_delay(self, attempt, error):
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+      return min(retry_after, self.backoff_max)
+    # Full jitter keeps concurrent workers from retrying in lockstep
+    return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+
+  def fall_back(self, entry, error):
+    if entry is None:
+      if isinstance(error, requests.exceptions.RequestException):
+        raise error
+      raise requests.exceptions.RequestException(str(error)) from error
+    logging.warning(f"Serving a cached response from {time.ctime(entry['stored_at'])}: {error}")
+    self.count("stale")
+    return entry
+
+  def snapshot(self):
+    with self.lock:
+      stats = dict(self.stats)
+      stats["open_circuits"] = [host for host, breaker in self.breakers.items()
+                                if breaker.failures >= breaker.threshold]
+    return stats
@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from a cache hit to a full backfill
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def format_labels(names, values, extra=()):
+  pairs = list(zip(names, values)) + list(extra)
+  if not pairs:
+    return ""
+  escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+  return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+  if value == math.inf:
+    return "+Inf"
+  return repr(float(value))
+
+
+class Metric:
+  # A family of samples in the Prometheus text format, one per label combination
+
+  kind = "untyped"
+
+  def __init__(self, name, documentation, labels=()):
+    self.name = name
+    self.documentation = documentation
+    self.labels = tuple(labels)
+    self.lock = threading.Lock()
+    self.values = {}
+
+  def key(self, labels):
+    return tuple(str(labels[name]) for name in self.labels)
+
+  def set(self, value, **labels):
+    # Also used to mirror counters that are kept elsewhere, such as the pool stats
+    with self.lock:
+      self.values[self.key(labels)] = value
+
+  def samples(self):
+    with self.lock:
+      return [(self.name, format_labels(self.labels, key), value) for key, value in sorted(self.values.items())]
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+    lines.extend(f"{name}{labels} {format_value(value)}" for name, labels, value in self.samples())
+    return "\n".join(lines)
+
+
+class Counter(Metric):
+  kind = "counter"
+
+  def inc(self, amount=1, **labels):
+    key = self.key(labels)
+    with self.lock:
+      self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+  kind = "gauge"
+
+
+class Histogram(Metric):
+  kind = "histogram"
+
+  def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    super().__init__(name, documentation, labels)
+    self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+  def observe(self, value, **labels):
+    key = self.key(labels)
+    with self.lock:
+      counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          counts[i] += 1
+      self.values[key] = (counts, total + value)
+
+  @contextmanager
+  def time(self, **labels):
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - started, **labels)
+
+  def samples(self):
+    samples = []
+    with self.lock:
+      for key, (counts, total) in sorted(self.values.items()):
+        for bound, count in zip(self.buckets, counts):
+          samples.append((f"{self.name}_bucket", format_labels(self.labels, key, [("le", format_value(bound))]), count))
+        samples.append((f"{self.name}_sum", format_labels(self.labels, key), total))
+        samples.append((f"{self.name}_count", format_labels(self.labels, key), counts[-1]))
+    return samples
+
+
+class Registry:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.metrics = {}
+
+  def register(self, metric):
+    with self.lock:
+      if metric.name in self.metrics:
+        raise ValueError(f"Metric {metric.name} is already registered")
+      self.metrics[metric.name] = metric
+    return metric
+
+  def render(self):
+    with self.lock:
+      metrics = list(self.metrics.values())
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labels=()):
+  return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name, documentation, labels=()):
+  return REGISTRY.register(Gauge(name, documentation, labels))
+
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+  return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+def render():
+  return REGISTRY.render()
@@ -1,72 +1,140 @@
-
-
-import mysql.connector
-import os
 import argparse
-from dotenv import load_dotenv
+import csv
+import sys
 
-# Set up argument parser
-parser = argparse.ArgumentParser(description="Show all table entries for a specific indicator.")
-parser.add_argument("indicator", help="The name of the indicator to display.")
-parser.add_argument("--first", type=int, help="Show only the first X entries.")
-args = parser.parse_args()
+import db
 
-# Load environment variables
-load_dotenv()
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
 
-DB_HOST = os.environ.get('MYSQL_HOST')
-DB_USER = os.environ.get('MYSQL_USER')
-DB_PASSWORD = os.environ.get('MYSQL_PASSWORD')
-DB_NAME = os.environ.get('MYSQL_DB')
+# Rows pulled from the database cursor at a time
+BATCH_SIZE = 5000
 
-try:
-    # Establish database connection
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
-    cursor = conn.cursor()
-
-    # Get the indicator_id, units, and last_updated from the indicators table
-    cursor.execute("SELECT id, units, last_updated FROM indicators WHERE name = %s", (args.indicator,))
-    indicator_info = cursor.fetchone()
-
-    if not indicator_info:
-        print(f"No indicator found with name: '{args.indicator}'")
-        cursor.close()
-        conn.close()
-        exit()
-
-    indicator_id = indicator_info[0]
-    indicator_units = indicator_info[1]
-    indicator_last_updated = indicator_info[2]
-
-    # Execute the query to fetch data for the specific indicator from historical_data
-    query = "SELECT date, value FROM historical_data WHERE indicator_id = %s ORDER BY date DESC"
-    if args.first:
-        query += f" LIMIT {args.first}"
-    cursor.execute(query, (indicator_id,))
+
+def print_summary(cursor):
+    # Counts and date ranges are kept up to date by the refresh job, so this never scans historical_data
+    cursor.execute("SELECT name, units, row_count, min_date, max_date, last_updated FROM indicators ORDER BY name")
     results = cursor.fetchall()
 
-    if results:
-        print(f"Historical data for '{args.indicator}' (Units: {indicator_units if indicator_units else 'N/A'}, Last Updated: {indicator_last_updated if indicator_last_updated else 'N/A'}):")
-        print(f"{'Date':<15} {'Value':<15}")
-        print('-'*30)
-        for row in results:
-            # Format the date for consistent output
-            date_str = row[0].strftime('%Y-%m-%d')
-            print(f"{date_str:<15} {row[1]:<15}")
+    print(f"{'Indicator':<30} {'Units':<30} {'Entries':<10} {'First Date':<12} {'Last Date':<12} {'Last Update Date':<20}")
+    print('-' * 118)
+    for name, units, row_count, min_date, max_date, last_updated in results:
+        print(f"{name:<30} {units if units is not None else '':<30} {row_count if row_count is not None else 'N/A':<10} "
+              f"{str(min_date) if min_date else 'N/A':<12} {str(max_date) if max_date else 'N/A':<12} "
+              f"{str(last_updated) if last_updated is not None else 'N/A':<20}")
+
+
+def find_indicators(cursor, names):
+    placeholders = ", ".join(["%s"] * len(names))
+    cursor.execute(f"SELECT id, name, units, last_updated, row_count, min_date, max_date FROM indicators WHERE name IN ({placeholders})",
+                   list(names))
+    found = {row[1]: row for row in cursor.fetchall()}
+    for name in names:
+        if name not in found:
+            print(f"No indicator found with name: '{name}'", file=sys.stderr)
+    return [found[name] for name in names if name in found]
+
+
+def stream_rows(cursor, indicator_id, start, end, order, limit):
+    # A range scan on the (indicator_id, date) unique index, read in batches
+    # from the unbuffered cursor instead of materializing every row
+    query = "SELECT date, value FROM historical_data WHERE indicator_id = %s"
+    params = [indicator_id]
+    if start:
+        query += " AND date >= %s"
+        params.append(start)
+    if end:
+        query += " AND date <= %s"
+        params.append(end)
+    query += f" ORDER BY date {'ASC' if order == 'asc' else 'DESC'}"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            return
+        yield rows
+
+
+def print_history(cursor, indicators, args):
+    for indicator_id, name, units, last_updated, row_count, min_date, max_date in indicators:
+        header_printed = False
+        for rows in stream_rows(cursor, indicator_id, args.start, args.end, args.order or 'desc', args.first):
+            if not header_printed:
+                print(f"Historical data for '{name}' (Units: {units if units else 'N/A'}, Last Updated: {last_updated if last_updated else 'N/A'}, "
+                      f"Entries: {row_count if row_count is not None else 'N/A'}, {min_date or 'N/A'} to {max_date or 'N/A'}):")
+                print(f"{'Date':<15} {'Value':<15}")
+                print('-' * 30)
+                header_printed = True
+            sys.stdout.write("".join(f"{date.strftime('%Y-%m-%d'):<15} {value:<15}\n" for date, value in rows))
+        if not header_printed:
+            print(f"No historical data found for indicator: '{name}'")
+
+
+def export_history(cursor, indicators, args):
+    fmt = args.format or ('parquet' if args.export.endswith('.parquet') else 'csv')
+    if fmt == 'parquet' and pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    total = 0
+    if fmt == 'csv':
+        with open(args.export, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['indicator', 'date', 'value'])
+            for indicator_id, name, *_ in indicators:
+                for rows in stream_rows(cursor, indicator_id, args.start, args.end, args.order or 'asc', args.first):
+                    writer.writerows((name, date.isoformat(), value) for date, value in rows)
+                    total += len(rows)
     else:
-        print(f"No historical data found for indicator: '{args.indicator}'")
+        schema = pa.schema([('indicator', pa.string()), ('date', pa.date32()), ('value', pa.float64())])
+        with pq.ParquetWriter(args.export, schema) as writer:
+            for indicator_id, name, *_ in indicators:
+                for rows in stream_rows(cursor, indicator_id, args.start, args.end, args.order or 'asc', args.first):
+                    dates, values = zip(*rows)
+                    writer.write_table(pa.table({'indicator': [name] * len(rows), 'date': list(dates), 'value': list(values)},
+                                                schema=schema))
+                    total += len(rows)
+    print(f"Exported {total} rows for {len(indicators)} indicators to {args.export}.")
+
 
-    # Clean up
-    cursor.close()
-    conn.close()
+if __name__ == '__main__':
+    # Set up argument parser
+    parser = argparse.ArgumentParser(
+        description="Show or export table entries for one or more indicators, or a summary of all indicators when none is given.")
+    parser.add_argument("indicators", nargs='*', help="The names of the indicators to display.")
+    parser.add_argument("--start", help="Only entries on or after this date (YYYY-MM-DD).")
+    parser.add_argument("--end", help="Only entries on or before this date (YYYY-MM-DD).")
+    parser.add_argument("--first", type=int, help="Show only the first X entries of each indicator.")
+    parser.add_argument("--order", choices=['asc', 'desc'],
+                        help="Date order (default: newest first when printing, oldest first when exporting).")
+    parser.add_argument("--export", metavar="PATH", help="Write the entries to a CSV or Parquet file instead of printing them.")
+    parser.add_argument("--format", choices=['csv', 'parquet'], help="Export format (default: from the file extension).")
+    args = parser.parse_args()
 
-except mysql.connector.Error as err:
-    print(f"Database Error: {err}")
-except Exception as e:
-    print(f"An error occurred: {e}")
+    try:
+        # Establish database connection
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        try:
+            if not args.indicators:
+                print_summary(cursor)
+            else:
+                indicators = find_indicators(cursor, args.indicators)
+                if indicators and args.export:
+                    export_history(cursor, indicators, args)
+                elif indicators:
+                    print_history(cursor, indicators, args)
+        finally:
+            # Clean up
+            cursor.close()
+            conn.close()
 
+    except db.Error as err:
+        print(f"Database Error: {err}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# db and app read their configuration on import, so it is set up before any test module imports them
+WORKDIR = tempfile.mkdtemp(prefix="tests_")
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(WORKDIR, "test.db")
+os.environ["HTTP_CACHE_DIR"] = os.path.join(WORKDIR, "http_cache")
+os.environ["FETCH_MIN_INTERVAL"] = "0"
+os.environ["FETCH_RETRIES"] = "0"
+os.environ["RENDER_WORKERS"] = "0"
+os.environ["PREWARM_RENDER_CACHE"] = "false"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@pytest.fixture
+def database():
+  # Empty tables in the shared SQLite file
+  import app
+  import db
+  app.create_database_and_tables()
+  conn = db.get_connection()
+  cursor = conn.cursor()
+  try:
+    for table in ["historical_data"] + [table for table, period, days in app.ROLLUPS] + ["indicators"]:
+      cursor.execute(f"DELETE FROM {table}")
+    conn.commit()
+  finally:
+    cursor.close()
+    conn.close()
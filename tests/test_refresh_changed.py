@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import app
+import db
+import http_cache
+from fred_stub import LAST_UPDATED, FredStub
+
+INDICATORS = {"Changed": "CHANGED", "Unchanged": "UNCHANGED", "Failing": "FAILING"}
+UPDATED = "2024-02-01 08:00:00-06"
+
+
+def history(series_id):
+  index = pd.bdate_range(end=datetime.today(), periods=200)
+  return pd.DataFrame({"value": np.arange(len(index), dtype=float)}, index=index)
+
+
+@pytest.fixture
+def stub(database, monkeypatch, tmp_path):
+  stub = FredStub(history)
+  monkeypatch.setattr(app, "FRED_API_URL", stub.start())
+  monkeypatch.setattr(app, "INDICATORS", INDICATORS)
+  monkeypatch.setattr(app, "DERIVED_INDICATORS", {})
+  monkeypatch.setattr(app, "last_checked", {})
+  monkeypatch.setattr(app, "load_state", {})
+  # No retries and a breaker that stays closed, so every failed fetch is one request
+  monkeypatch.setattr(app, "upstream", http_cache.CachedClient(
+      http_cache.ResponseCache(str(tmp_path)), requests.Session(), app.HostRateLimiter(0), 5, 0, 0, 0, 100, 0))
+  yield stub
+  stub.stop()
+
+
+def poll(stub):
+  # Upstream requests made by one refresh_changed() run, per endpoint
+  before = stub.snapshot()["requests"]
+  app.refresh_changed()
+  after = stub.snapshot()["requests"]
+  return {endpoint: count - before[endpoint] for endpoint, count in after.items() if count != before[endpoint]}
+
+
+def source_updated():
+  conn = db.get_connection()
+  cursor = conn.cursor(dictionary=True)
+  try:
+    cursor.execute("SELECT name, source_updated FROM indicators")
+    return {row["name"]: row["source_updated"] for row in cursor.fetchall()}
+  finally:
+    cursor.close()
+    conn.close()
+
+
+def test_first_poll_checks_each_series(stub):
+  assert poll(stub) == {"series": 3, "observations": 3}
+  assert source_updated() == dict.fromkeys(INDICATORS, LAST_UPDATED)
+
+
+def test_poll_lists_updates_and_retries_failed_fetch(stub):
+  poll(stub)
+
+  stub.updated = {"CHANGED": UPDATED, "FAILING": UPDATED}
+  stub.failing.add("FAILING")
+  assert poll(stub) == {"updates": 1, "observations": 2}
+  assert source_updated() == {"Changed": UPDATED, "Unchanged": LAST_UPDATED, "Failing": LAST_UPDATED}
+  assert app.load_state["Failing"]["state"] == "failed"
+
+  # The failed series is listed again and fetched once FRED answers
+  stub.failing.clear()
+  assert poll(stub) == {"updates": 1, "observations": 1}
+  assert source_updated() == {"Changed": UPDATED, "Unchanged": LAST_UPDATED, "Failing": UPDATED}
+
+  assert poll(stub) == {"updates": 1}
+
+
+def test_long_listing_falls_back_to_series_checks(stub, monkeypatch):
+  poll(stub)
+
+  # Six pages of one entry cost more than checking the three series
+  monkeypatch.setattr(app, "FRED_UPDATES_PAGE_SIZE", 1)
+  stub.updated = dict({f"OTHER{i}": UPDATED for i in range(5)}, CHANGED=UPDATED)
+  assert poll(stub) == {"updates": 3, "series": 3, "observations": 1}
+  assert source_updated()["Changed"] == UPDATED
+
+
+def test_series_outside_the_listing_window_are_checked_one_by_one(stub):
+  poll(stub)
+
+  expired = datetime.now(timezone.utc) - app.FRED_UPDATES_WINDOW - timedelta(hours=1)
+  app.last_checked.update(dict.fromkeys(INDICATORS, expired))
+  assert poll(stub) == {"series": 3}
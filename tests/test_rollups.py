@@ -0,0 +1,58 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import app
+import db
+
+
+@pytest.fixture
+def cursor(database):
+  conn = db.get_connection()
+  cursor = conn.cursor(dictionary=True)
+  yield cursor
+  conn.rollback()
+  cursor.close()
+  conn.close()
+
+
+def store(cursor, indicator_id, values):
+  app.upsert_historical_data(cursor, indicator_id, values.to_frame("value"))
+
+
+def rollup_rows(cursor, table, indicator_id):
+  cursor.execute(f"SELECT period_start, date, last_value, count FROM {table} WHERE indicator_id = %s ORDER BY period_start",
+                 (indicator_id,))
+  return {pd.Timestamp(row["period_start"]).date(): row for row in cursor.fetchall()}
+
+
+def test_full_rollup(cursor):
+  indicator_id = app.get_indicator_id(cursor, "Daily", "Units")
+  values = pd.Series(1.0, index=pd.bdate_range("2024-02-01", "2024-03-29"))
+  store(cursor, indicator_id, values)
+  app.update_rollups(cursor, indicator_id)
+
+  monthly = rollup_rows(cursor, "historical_data_monthly", indicator_id)
+  assert [row["count"] for row in monthly.values()] == [21, 21]
+  weekly = rollup_rows(cursor, "historical_data_weekly", indicator_id)
+  assert min(weekly) == date(2024, 1, 29)
+  assert sum(row["count"] for row in weekly.values()) == len(values)
+
+
+def test_update_keeps_week_starting_in_previous_month(cursor):
+  indicator_id = app.get_indicator_id(cursor, "Daily", "Units")
+  store(cursor, indicator_id, pd.Series(1.0, index=pd.bdate_range("2024-02-01", "2024-03-29")))
+  app.update_rollups(cursor, indicator_id)
+
+  # Friday 2024-03-01 is revised; its week starts on Monday 2024-02-26
+  store(cursor, indicator_id, pd.Series([2.0], index=pd.to_datetime(["2024-03-01"])))
+  app.update_rollups(cursor, indicator_id, date(2024, 3, 1))
+
+  week = rollup_rows(cursor, "historical_data_weekly", indicator_id)[date(2024, 2, 26)]
+  assert week["count"] == 5
+  assert week["last_value"] == 2.0
+  assert pd.Timestamp(week["date"]).date() == date(2024, 3, 1)
+  monthly = rollup_rows(cursor, "historical_data_monthly", indicator_id)
+  assert monthly[date(2024, 2, 1)]["count"] == 21
+  assert monthly[date(2024, 3, 1)]["count"] == 21